@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends
 
 from src.core.container import Container
 from src.core.dependencies import get_current_active_user
+from src.core.executors import BoundedExecutor
 from src.schema.auth_schema import SignIn, SignInResponse, SignUp
 from src.schema.user_schema import User, BaseUser, BaseUserWithBalance
 from src.services.auth_service import AuthService
@@ -20,8 +21,12 @@ router = APIRouter(
     response_model_exclude={'user_info': {'password': True}}
 )
 @inject
-async def sign_in(user_info: SignIn, service: AuthService = Depends(Provide[Container.auth_service])):
-    return service.sign_in(user_info)
+async def sign_in(
+        user_info: SignIn,
+        service: AuthService = Depends(Provide[Container.auth_service]),
+        auth_executor: BoundedExecutor = Depends(Provide[Container.auth_executor]),
+):
+    return await auth_executor.run(service.sign_in, user_info)
 
 
 @router.post(
@@ -31,8 +36,12 @@ async def sign_in(user_info: SignIn, service: AuthService = Depends(Provide[Cont
     response_model_exclude={'password': True}
 )
 @inject
-async def sign_up(user_info: SignUp, service: AuthService = Depends(Provide[Container.auth_service])):
-    return service.sign_up(user_info)
+async def sign_up(
+        user_info: SignUp,
+        service: AuthService = Depends(Provide[Container.auth_service]),
+        auth_executor: BoundedExecutor = Depends(Provide[Container.auth_executor]),
+):
+    return await auth_executor.run(service.sign_up, user_info)
 
 
 @router.post(
@@ -43,8 +52,12 @@ async def sign_up(user_info: SignUp, service: AuthService = Depends(Provide[Cont
     response_model_exclude={'password': True}
 )
 @inject
-async def sign_up_admin(user_info: SignUp, service: AuthService = Depends(Provide[Container.auth_service])):
-    return service.sign_up(user_info, is_superuser=True)
+async def sign_up_admin(
+        user_info: SignUp,
+        service: AuthService = Depends(Provide[Container.auth_service]),
+        auth_executor: BoundedExecutor = Depends(Provide[Container.auth_executor]),
+):
+    return await auth_executor.run(service.sign_up, user_info, is_superuser=True)
 
 
 @router.get(
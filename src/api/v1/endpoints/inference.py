@@ -1,91 +1,167 @@
 import asyncio
 import json
+import logging
 import os
 import pathlib
 import time
 
-import httpx
+import numpy as np
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Depends, UploadFile, File, Form, Path, HTTPException, Body
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Path, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
-from src.celery_application.tasks import model_initialize_task, change_server_state
+from src.celery_application.tasks import bulk_scoring_task, initialize_server
+from src.core.classification_models.AdmissionController import AdmissionController
+from src.core.classification_models.PredictionCache import PredictionCache
+from src.core.classification_models.ReplicaRouter import ReplicaRouter
+from src.core.classification_models.RoutingCache import RoutingCache
+from src.core.classification_models.inference_server import tensor_codec
+from src.core.config import configs
 from src.core.container import Container
-from src.core.dependencies import get_current_active_user, get_current_super_user
-from src.model.models import ClassificationModelORM, InferenceServerORM
+from src.core.database import AsyncDatabase, Database
+from src.core.dependencies import get_current_active_user, get_current_super_user, verify_metrics_key
+from src.core.exceptions import NotFoundError, ValidationError
+from src.core.executors import BoundedExecutor
+from src.core.invalidation import publish_invalidation
+from src.core.model_store import iter_upload, store_artifact
+from src.core.write_buffer import WriteBehindBuffer
+from src.model.models import BulkScoringJobORM, ClassificationModelORM
+from src.schema.autoscaling_schema import AutoscalingPolicyInputSchema, AutoscalingPolicySchema, ModelMetricsSchema
+from src.schema.bulk_scoring_schema import BulkScoringJobInputSchema, BulkScoringJobSchema, BulkScoringRequestSchema
 from src.schema.classificator_schema import BaseClassificatorSchema
 from src.schema.deploy_schema import DeployResponseSchema, DeployResultSchema
 from src.schema.inference_schema import ClassificationModelListQuerySchema, \
-    ClassificationModelListResponseSchema, InferenceServerInputSchema
+    ClassificationModelListResponseSchema, ExecutorStatsSchema, ModelCacheSettingSchema, PoolStatsSchema, \
+    PredictionCacheStatsSchema
 from src.schema.prediction_schema import InputPredictionSchema, PredictionResponseSchema, PredictionPaginationSchema, \
-    PredictionPaginationSchemaByUser, PredictionListResponseSchema
+    PredictionPaginationSchemaByUser, PredictionListResponseSchema, InputTensorSchema
 from src.schema.user_schema import User
-from src.services import UserService
-from src.services.classificator_service import ClassificatorService
+from src.services.autoscaling_service import AutoscalingService
+from src.services.bulk_scoring_service import BulkScoringService
+from src.services.classificator_service import AsyncClassificatorService, ClassificatorService
 from src.services.inference_service import InferenceService
 from src.services.prediction_service import PredictionService
 from src.util.date import get_now
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/inference",
     tags=["inference"],
 )
 
 
-@router.post('/predict/{model_id}')
+async def get_input_tensor(request: Request) -> np.ndarray:
+    body = await request.body()
+    content_type = tensor_codec.media_type(request.headers.get('content-type'))
+    try:
+        if content_type in tensor_codec.BINARY_CONTENT_TYPES:
+            tensor = tensor_codec.decode_tensor(body, content_type)
+        else:
+            tensor = np.asarray(InputTensorSchema.model_validate_json(body).input_tensor, dtype=float)
+    except ValueError as e:
+        raise ValidationError(detail=str(e))
+    # rejected here, before admission and billing, instead of failing on the replica
+    if tensor.ndim != 2 or 0 in tensor.shape:
+        raise ValidationError(detail=f'expected a non-empty 2-D tensor, got shape {tensor.shape}')
+    return tensor
+
+
+def prediction_record(current_user, server_id, input_tensor, inference_data, creation_time):
+    return InputPredictionSchema(
+        created_at=creation_time,
+        predicted_at=get_now(),
+        predictor=server_id,
+        input_data={'input_tensor': input_tensor.tolist()},
+        output_data=inference_data,
+        user_id=current_user.id
+    )
+
+
+@router.post(
+    '/predict/{model_id}',
+    openapi_extra=tensor_codec.openapi_request_body(InputTensorSchema.model_json_schema())
+)
 @inject
 async def predict(
-        input_tensor: list[list[float]] = Body(embed=True),
+        input_tensor: np.ndarray = Depends(get_input_tensor),
         model_id: int = Path(...),
         current_user: User = Depends(get_current_active_user),
         inference_service: InferenceService = Depends(Provide[Container.inference_service]),
-        user_service: UserService = Depends(Provide[Container.user_service]),
-        prediction_service: PredictionService = Depends(Provide[Container.prediction_service]),
-        classificator_service: PredictionService = Depends(Provide[Container.classificator_service])
+        prediction_writer: WriteBehindBuffer = Depends(Provide[Container.prediction_writer]),
+        classificator_service: AsyncClassificatorService = Depends(Provide[Container.async_classificator_service]),
+        routing_cache: RoutingCache = Depends(Provide[Container.routing_cache])
 ) -> PredictionResponseSchema:
     creation_time = get_now()
-    classificator = classificator_service.get_by_id(model_id)
-    input_data = {'input_tensor': input_tensor}
-    for retry in range(2):
-        try:
-            server_id, inference_data = inference_service.infer(
-                current_user,
-                model=classificator,
-                input_data=input_data
-            )
-            break
-        except httpx.ConnectError as e:
-            raise HTTPException(status_code=404, detail='No active inference server found!')
-    else:
-        raise HTTPException(status_code=504)
-    prediction_schema = InputPredictionSchema(
-        created_at=creation_time,
-        predicted_at=get_now(),
-        predictor=server_id,
-        input_data=input_data,
-        output_data=inference_data,
-        user_id=current_user.id
+    classificator = await routing_cache.model(model_id, classificator_service.get_by_id)
+    server_id, inference_data = await inference_service.infer(
+        current_user,
+        model=classificator,
+        input_tensor=input_tensor
+    )
+    await prediction_writer.add(
+        prediction_record(current_user, server_id, input_tensor, inference_data, creation_time)
     )
-    user_service.put_update(current_user.id, current_user)
+    return {'predictor': server_id, 'output_data': inference_data}
 
-    new_prediction = prediction_service.add(prediction_schema)
-    return {'predictor': new_prediction.predictor, 'output_data': inference_data}
 
+@router.post(
+    '/predict/{model_id}/batch',
+    response_class=StreamingResponse,
+    description="Scores the tensor in chunks of INFERENCE_CHUNK_ROWS rows spread over the model's replicas "
+                "and streams one NDJSON line per chunk as soon as it completes. "
+                "Every chunk is billed and logged as its own prediction.",
+    openapi_extra=tensor_codec.openapi_request_body(InputTensorSchema.model_json_schema())
+)
+@inject
+async def predict_batch(
+        input_tensor: np.ndarray = Depends(get_input_tensor),
+        model_id: int = Path(...),
+        current_user: User = Depends(get_current_active_user),
+        inference_service: InferenceService = Depends(Provide[Container.inference_service]),
+        prediction_writer: WriteBehindBuffer = Depends(Provide[Container.prediction_writer]),
+        classificator_service: AsyncClassificatorService = Depends(Provide[Container.async_classificator_service]),
+        routing_cache: RoutingCache = Depends(Provide[Container.routing_cache])
+):
+    classificator = await routing_cache.model(model_id, classificator_service.get_by_id)
+    chunk_rows = configs.INFERENCE_CHUNK_ROWS
+    concurrency = asyncio.Semaphore(configs.INFERENCE_CHUNK_CONCURRENCY)
 
-def initialize_server(inference_service, model, cost):
-    inference_server_model = inference_service.add(
-        InferenceServerInputSchema(
-            linked_model_id=model.id,
-            cost=cost,
-            server_state=InferenceServerORM.ServerState.STARTING
-        )
-    )
-    model_initialize_task.apply_async(
-        args=[
-            model.model_dump()
-        ],
-        link=change_server_state.s(server_id=inference_server_model.id)
-    )
-    return inference_server_model
+    async def score_chunk(offset: int) -> dict:
+        chunk = input_tensor[offset:offset + chunk_rows]
+        async with concurrency:
+            creation_time = get_now()
+            try:
+                server_id, inference_data = await inference_service.infer(
+                    current_user,
+                    model=classificator,
+                    input_tensor=chunk
+                )
+            except HTTPException as e:
+                return {'offset': offset, 'rows': len(chunk), 'status_code': e.status_code, 'detail': e.detail}
+            except Exception as e:
+                # one failing chunk must not abort the stream of the others
+                logger.exception('Scoring rows %s of model %s failed', offset, model_id)
+                return {'offset': offset, 'rows': len(chunk), 'status_code': 500, 'detail': str(e)}
+        try:
+            await prediction_writer.add(
+                prediction_record(current_user, server_id, chunk, inference_data, creation_time)
+            )
+        except Exception:
+            # the chunk is scored and billed, only its log record is lost
+            logger.exception('Could not log the prediction for rows %s of model %s', offset, model_id)
+        return {'offset': offset, 'rows': len(chunk), 'predictor': server_id, 'output_data': inference_data}
+
+    async def stream_results():
+        chunks = [asyncio.create_task(score_chunk(offset)) for offset in range(0, len(input_tensor), chunk_rows)]
+        try:
+            for scored in asyncio.as_completed(chunks):
+                yield json.dumps(await scored) + '\n'
+        finally:
+            for chunk in chunks:
+                chunk.cancel()
+
+    return StreamingResponse(stream_results(), media_type='application/x-ndjson')
 
 
 @router.post('/deploy/{model_id}')
@@ -96,9 +172,10 @@ async def deploy_for_model(
         classificator_service: ClassificatorService = Depends(Provide[Container.classificator_service]),
         inference_service: InferenceService = Depends(Provide[Container.inference_service]),
         current_user: User = Depends(get_current_super_user),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
 ) -> DeployResponseSchema:
-    model = classificator_service.get_by_id(model_id)
-    inference_server_model = initialize_server(inference_service, model, cost)
+    model = await db_executor.run(classificator_service.get_by_id, model_id)
+    inference_server_model = await db_executor.run(initialize_server, inference_service, model, cost)
     return {
         'server_state': inference_server_model.server_state,
         'id': inference_server_model.id,
@@ -111,18 +188,60 @@ async def deploy_for_model(
 async def deploy(
         model_name: str = Form(),
         cost: float = Form(),
+        cache_predictions: bool = Form(default=False),
         deploy_file: UploadFile = File(...),
         current_user: User = Depends(get_current_super_user),
         inference_service: InferenceService = Depends(Provide[Container.inference_service]),
-        classificator_service: ClassificatorService = Depends(Provide[Container.classificator_service])
+        classificator_service: ClassificatorService = Depends(Provide[Container.classificator_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
+) -> DeployResponseSchema:
+    content_hash, artifact = await store_artifact(iter_upload(deploy_file), deploy_file.filename)
+    return await db_executor.run(
+        register_model,
+        inference_service, classificator_service, model_name, cost, cache_predictions, content_hash, artifact
+    )
+
+
+@router.post('/deploy/stream/')
+@inject
+async def deploy_stream(
+        request: Request,
+        model_name: str,
+        cost: float,
+        cache_predictions: bool = False,
+        filename: str = 'model.pkl',
+        current_user: User = Depends(get_current_super_user),
+        inference_service: InferenceService = Depends(Provide[Container.inference_service]),
+        classificator_service: ClassificatorService = Depends(Provide[Container.classificator_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
 ) -> DeployResponseSchema:
-    path = pathlib.Path(os.getenv('CELERY_MODEL_FILE_ROOT')) / deploy_file.filename
-    with open(pathlib.Path(os.getenv('MODEL_FILE_ROOT')) / deploy_file.filename, 'wb+') as f:
-        f.write(await deploy_file.read())
+    """
+    Deploys a model sent as the raw request body. Unlike the multipart route,
+    the body goes straight to the content store without being spooled first.
+    """
+    content_hash, artifact = await store_artifact(request.stream(), filename)
+    return await db_executor.run(
+        register_model,
+        inference_service, classificator_service, model_name, cost, cache_predictions, content_hash, artifact
+    )
+
+
+def register_model(
+        inference_service: InferenceService,
+        classificator_service: ClassificatorService,
+        model_name: str,
+        cost: float,
+        cache_predictions: bool,
+        content_hash: str,
+        artifact: str
+):
+    path = pathlib.Path(os.getenv('CELERY_MODEL_FILE_ROOT')) / artifact
     classificator_schema = BaseClassificatorSchema(
         name=model_name,
         cost=cost,
-        model_file=str(path.as_posix())
+        model_file=str(path.as_posix()),
+        content_hash=content_hash,
+        cache_predictions=cache_predictions
     )
     model: ClassificationModelORM = classificator_service.add(classificator_schema)
     inference_server_model = initialize_server(inference_service, model, cost)
@@ -133,24 +252,155 @@ async def deploy(
     }
 
 
+@router.post('/bulk/{model_id}')
+@inject
+async def start_bulk_scoring(
+        bulk_request: BulkScoringRequestSchema,
+        model_id: int = Path(...),
+        current_user: User = Depends(get_current_super_user),
+        classificator_service: ClassificatorService = Depends(Provide[Container.classificator_service]),
+        bulk_scoring_service: BulkScoringService = Depends(Provide[Container.bulk_scoring_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
+) -> BulkScoringJobSchema:
+    model = await db_executor.run(classificator_service.get_by_id, model_id)
+    job = await db_executor.run(
+        bulk_scoring_service.add,
+        BulkScoringJobInputSchema(
+            **bulk_request.model_dump(),
+            model_id=model.id,
+            state=BulkScoringJobORM.JobState.PENDING.value
+        )
+    )
+    bulk_scoring_task.delay(job.id)
+    return job
+
+
+@router.get('/bulk/job/{job_id}')
+@inject
+async def bulk_scoring_state(
+        job_id: int,
+        current_user: User = Depends(get_current_super_user),
+        bulk_scoring_service: BulkScoringService = Depends(Provide[Container.bulk_scoring_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
+) -> BulkScoringJobSchema:
+    return await db_executor.run(bulk_scoring_service.get_by_id, job_id)
+
+
+@router.post('/bulk/job/{job_id}/resume')
+@inject
+async def resume_bulk_scoring(
+        job_id: int,
+        current_user: User = Depends(get_current_super_user),
+        bulk_scoring_service: BulkScoringService = Depends(Provide[Container.bulk_scoring_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
+) -> BulkScoringJobSchema:
+    job = await db_executor.run(bulk_scoring_service.resume, job_id)
+    bulk_scoring_task.delay(job.id)
+    return job
+
+
 @router.get('/server/state/{server_id}')
 @inject
 async def server_state(
         server_id: int,
         current_user: User = Depends(get_current_super_user),
         inference_service: InferenceService = Depends(Provide[Container.inference_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
 ) -> DeployResultSchema:
-    return inference_service.get_by_id(server_id)
+    return await db_executor.run(inference_service.get_by_id, server_id)
+
+
+@router.patch('/models/{model_id}/cache')
+@inject
+async def set_prediction_caching(
+        cache_predictions: bool,
+        model_id: int = Path(...),
+        current_user: User = Depends(get_current_super_user),
+        classificator_service: ClassificatorService = Depends(Provide[Container.classificator_service]),
+        prediction_cache: PredictionCache = Depends(Provide[Container.prediction_cache]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
+) -> ModelCacheSettingSchema:
+    model = await db_executor.run(classificator_service.patch_attr, model_id, 'cache_predictions', cache_predictions)
+    prediction_cache.invalidate(model_id)
+    await asyncio.to_thread(publish_invalidation, configs.CELERY_BROKER, RoutingCache.TOPIC, model_id)
+    return model
+
+
+@router.get('/cache/stats')
+@inject
+async def prediction_cache_stats(
+        current_user: User = Depends(get_current_super_user),
+        prediction_cache: PredictionCache = Depends(Provide[Container.prediction_cache]),
+) -> PredictionCacheStatsSchema:
+    return prediction_cache.stats()
+
+
+@router.get('/metrics', dependencies=[Depends(verify_metrics_key)])
+@inject
+async def replica_metrics(
+        replica_router: ReplicaRouter = Depends(Provide[Container.replica_router]),
+        admission_controller: AdmissionController = Depends(Provide[Container.admission_controller]),
+) -> list[ModelMetricsSchema]:
+    metrics = replica_router.metrics()
+    for model in metrics:
+        model.update(admission_controller.stats(model['model_id']))
+    return metrics
+
+
+@router.get('/metrics/executors', dependencies=[Depends(verify_metrics_key)])
+@inject
+async def executor_metrics(
+        auth_executor: BoundedExecutor = Depends(Provide[Container.auth_executor]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
+) -> list[ExecutorStatsSchema]:
+    return [auth_executor.stats(), db_executor.stats()]
+
+
+@router.get('/metrics/pools', dependencies=[Depends(verify_metrics_key)])
+@inject
+async def pool_metrics(
+        db: Database = Depends(Provide[Container.db]),
+        async_db: AsyncDatabase = Depends(Provide[Container.async_db]),
+) -> list[PoolStatsSchema]:
+    return [{'name': 'sync', **db.pool_stats()}, {'name': 'async', **async_db.pool_stats()}]
+
+
+@router.put('/models/{model_id}/autoscaling')
+@inject
+async def set_autoscaling_policy(
+        policy: AutoscalingPolicyInputSchema,
+        model_id: int = Path(...),
+        current_user: User = Depends(get_current_super_user),
+        classificator_service: ClassificatorService = Depends(Provide[Container.classificator_service]),
+        autoscaling_service: AutoscalingService = Depends(Provide[Container.autoscaling_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
+) -> AutoscalingPolicySchema:
+    model = await db_executor.run(classificator_service.get_by_id, model_id)
+    return await db_executor.run(autoscaling_service.set_policy, model.id, policy)
+
+
+@router.get('/models/{model_id}/autoscaling')
+@inject
+async def get_autoscaling_policy(
+        model_id: int = Path(...),
+        current_user: User = Depends(get_current_super_user),
+        autoscaling_service: AutoscalingService = Depends(Provide[Container.autoscaling_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
+) -> AutoscalingPolicySchema:
+    policy = await db_executor.run(autoscaling_service.get_policy, model_id)
+    if policy is None:
+        raise NotFoundError(detail=f'no autoscaling policy for model {model_id}')
+    return policy
 
 
 @router.get('/models/list')
 @inject
 async def list_classificator_models(
         query_params: ClassificationModelListQuerySchema = Depends(),
-        classificator_service: ClassificatorService = Depends(Provide[Container.classificator_service]),
-        current_user: User = Depends(get_current_active_user)
+        classificator_service: AsyncClassificatorService = Depends(Provide[Container.async_classificator_service]),
+        current_user: User = Depends(get_current_active_user),
 ) -> ClassificationModelListResponseSchema:
-    classificators = classificator_service.get_list(schema=query_params)
+    classificators = await classificator_service.get_list(schema=query_params)
     return classificators
 
 
@@ -160,8 +410,10 @@ async def list_predictions(
         query_params: PredictionPaginationSchema = Depends(),
         current_user: User = Depends(get_current_active_user),
         prediction_service: PredictionService = Depends(Provide[Container.prediction_service]),
+        db_executor: BoundedExecutor = Depends(Provide[Container.db_executor]),
 ) -> PredictionListResponseSchema:
-    predictions = prediction_service.get_list(
+    predictions = await db_executor.run(
+        prediction_service.get_list,
         PredictionPaginationSchemaByUser(**query_params.model_dump(), user_id=current_user.id)
     )
     return predictions
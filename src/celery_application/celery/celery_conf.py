@@ -48,6 +48,11 @@ celery_app.conf.beat_schedule = {
         'task': 'health_check',
         'schedule': 60.0,
         'args': []
+    },
+    'autoscale-replicas': {
+        'task': 'autoscale',
+        'schedule': float(os.getenv('AUTOSCALE_INTERVAL', 15)),
+        'args': []
     }
 }
 
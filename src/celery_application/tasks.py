@@ -1,24 +1,85 @@
+import asyncio
 import logging
+import os
+import signal
+import time
+
+import httpx
+from celery.signals import worker_process_init, worker_process_shutdown
 
 from . import celery_app
+from .celery.celery_conf import log_handler
+from src.core import autoscaler, bulk_scoring
+from src.core.classification_models.InferenceClient import SyncInferenceClient
+from src.core.classification_models.RoutingCache import RoutingCache
+from src.core.config import configs
 from src.core.container import Container
-from src.model.models import ClassificationModelORM, InferenceServerORM
+from src.core.invalidation import publish_invalidation
+from src.core.pool_telemetry import PoolStatsLogger
+from src.model.models import BulkScoringJobORM, ClassificationModelORM, InferenceServerORM
 from src.schema.deploy_schema import DeployResultSchema
-from ..schema.inference_schema import InferenceServerActiveSchema
+from ..schema.inference_schema import InferenceServerActiveSchema, InferenceServerInputSchema
 from ..services.inference_service import InferenceException
 
 logger = celery_app.log.get_default_logger()
 
 
+def consumes_cold_starts() -> bool:
+    return 'cold_start_q' in celery_app.amqp.queues.consume_from
+
+
+@worker_process_init.connect
+def start_cold_start_helpers(**kwargs):
+    # only the cold start worker spawns servers; run it with -c 1 so the node has one pool and one supervisor
+    if not consumes_cold_starts():
+        return
+    Container.warm_pool().start()
+    Container.startup_supervisor().start()
+
+
+@worker_process_init.connect
+def start_pool_stats_logger(**kwargs):
+    # the snapshots go to the celery log file next to the task logs
+    PoolStatsLogger(configs.DB_POOL_STATS_INTERVAL, log_handler, celery=Container.db()).start()
+
+
+@worker_process_shutdown.connect
+def stop_cold_start_helpers(**kwargs):
+    if not consumes_cold_starts():
+        return
+    Container.warm_pool().close()
+    Container.startup_supervisor().stop()
+
+
 @celery_app.task(
     queue='cold_start_q',
     name='model_initialize_task',
 )
-def model_initialize_task(model_serialized: dict):
+def model_initialize_task(model_serialized: dict, server_id: int):
     model = ClassificationModelORM.model_validate(model_serialized)
-    deployment_result: DeployResultSchema = Container.inference_service().cold_start(model)
-    logger.info(deployment_result.model_dump())
-    return deployment_result.model_dump()
+
+    def on_result(deployment_result: DeployResultSchema):
+        logger.info(deployment_result.model_dump())
+        change_server_state(deployment_result.model_dump(), server_id=server_id)
+
+    Container.inference_service().cold_start(model, server_id, on_result)
+
+
+def initialize_server(inference_service, model, cost):
+    inference_server_model = inference_service.add(
+        InferenceServerInputSchema(
+            linked_model_id=model.id,
+            cost=cost,
+            server_state=InferenceServerORM.ServerState.STARTING
+        )
+    )
+    model_initialize_task.apply_async(
+        args=[
+            model.model_dump(),
+            inference_server_model.id
+        ]
+    )
+    return inference_server_model
 
 
 @celery_app.task(
@@ -26,7 +87,8 @@ def model_initialize_task(model_serialized: dict):
     name='change_server_state'
 )
 def change_server_state(initializing_result, server_id: int):
-    Container.inference_service().put_update(server_id, DeployResultSchema(**initializing_result))
+    server = Container.inference_service().put_update(server_id, DeployResultSchema(**initializing_result))
+    publish_invalidation(configs.CELERY_BROKER, RoutingCache.TOPIC, server.linked_model_id)
 
 
 @celery_app.task(
@@ -39,13 +101,165 @@ def health_check_models():
     inference_servers: list[InferenceServerORM] = inference_service.get_list(
         InferenceServerActiveSchema(**{'server_state': InferenceServerORM.ServerState.ALIVE})
     )['founds']
-    for server in inference_servers:
+    changes = asyncio.run(inference_service.health_sweep(inference_servers))
+    # servers whose cold start was lost or never reported would count as replicas forever, the margin
+    # leaves the ones the startup supervisor still watches alone
+    stale = inference_service.get_stale_starting(2 * configs.SERVER_READY_TIMEOUT)
+    changes += [{'id': server.id, 'server_state': InferenceServerORM.ServerState.DEAD.value} for server in stale]
+    if changes:
+        inference_service.patch_many(changes)
+    linked_ids = {server.id: server.linked_model_id for server in inference_servers + stale}
+    affected_models = {linked_ids[change['id']] for change in changes}
+    affected_models.update(change['linked_model_id'] for change in changes if 'linked_model_id' in change)
+    for model_id in affected_models:
+        publish_invalidation(configs.CELERY_BROKER, RoutingCache.TOPIC, model_id)
+    # a server that stopped answering may still hold its port and memory
+    for change in changes:
+        if change.get('server_state') == InferenceServerORM.ServerState.DEAD.value:
+            retire_server_task.delay(change['id'])
+    logger.info(
+        f'Health check finished: {len(inference_servers)} servers, {len(stale)} stuck starting, '
+        f'{len(changes)} changed'
+    )
+
+
+@celery_app.task(
+    queue='health_check_q',
+    name='autoscale'
+)
+def autoscale():
+    if not configs.AUTOSCALER_METRICS_URL:
+        return
+    try:
+        response = httpx.get(
+            configs.AUTOSCALER_METRICS_URL, headers={'X-Metrics-Key': configs.METRICS_API_KEY}, timeout=5
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning(f'Autoscaler could not read metrics: {e}')
+        return
+    metrics = {model['model_id']: model for model in response.json()}
+    now = time.time()
+    autoscaling_service = Container.autoscaling_service()
+    inference_service = Container.inference_service()
+    for policy in autoscaling_service.get_policies():
+        model_metrics = metrics.get(
+            policy.model_id, {'requests': 0, 'in_flight': 0, 'latency_ms': 0.0, 'replicas': []}
+        )
+        rate = autoscaler.request_rate(policy, model_metrics['requests'], now)
+        servers = inference_service.get_active_replicas(policy.model_id)
+        decision = autoscaler.plan(policy, model_metrics, servers, rate, now)
+        if decision.start:
+            model = Container.classificator_service().get_by_id(policy.model_id)
+            for _ in range(decision.start):
+                initialize_server(inference_service, model, policy.cost)
+        if decision.retire:
+            inference_service.patch_many([
+                {'id': server_id, 'server_state': InferenceServerORM.ServerState.DEAD.value}
+                for server_id in decision.retire
+            ])
+            publish_invalidation(configs.CELERY_BROKER, RoutingCache.TOPIC, policy.model_id)
+            for server_id in decision.retire:
+                retire_server_task.apply_async(args=[server_id], countdown=configs.AUTOSCALE_DRAIN_SECONDS)
+        if decision.start or decision.retire:
+            logger.info(
+                f'Autoscaler: model {policy.model_id} had {len(servers)} replicas, '
+                f'starting {decision.start}, retiring {decision.retire}'
+            )
+        autoscaling_service.record_pass(policy, model_metrics['requests'], now, bool(decision.start or decision.retire))
+
+
+@celery_app.task(
+    queue='health_check_q',
+    name='retire_server_task'
+)
+def retire_server_task(server_id: int):
+    # the server is already DEAD and out of rotation, uvicorn finishes what is in flight on SIGTERM
+    server = Container.inference_service().get_by_id(server_id)
+    if server.pid:
         try:
-            linked_id = inference_service.do_health_check(server)
-            inference_service.patch_attr(server.id, 'linked_model_id', linked_id)
-        except InferenceException:
-            inference_service.patch_attr(
-                server.id,
-                'server_state',
-                InferenceServerORM.ServerState.DEAD.value
+            os.kill(server.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    if server.current_socket_path and os.path.exists(server.current_socket_path):
+        os.unlink(server.current_socket_path)
+
+
+@celery_app.task(
+    queue='default_q',
+    name='bulk_scoring_task'
+)
+def bulk_scoring_task(job_id: int):
+    """Splits the input into chunks and queues the ones without a part file; also used to resume."""
+    service = Container.bulk_scoring_service()
+    job: BulkScoringJobORM = service.get_by_id(job_id)
+    offsets = list(bulk_scoring.chunk_offsets(job.input_path, job.chunk_rows))
+    bulk_scoring.parts_dir(job.output_path).mkdir(parents=True, exist_ok=True)
+    missing = [
+        (index, start, end) for index, (start, end) in enumerate(offsets)
+        if not bulk_scoring.part_path(job.output_path, index).exists()
+    ]
+    service.start(job_id, total_chunks=len(offsets), done_chunks=len(offsets) - len(missing))
+    logger.info(f'Bulk scoring job {job_id}: {len(missing)} of {len(offsets)} chunks to score')
+    if not missing:
+        finish_bulk_scoring_task.delay(job_id)
+    for index, start, end in missing:
+        score_chunk_task.delay(job_id, index, start, end)
+
+
+@celery_app.task(
+    queue='default_q',
+    name='score_chunk_task',
+    bind=True,
+    acks_late=True,
+    max_retries=5
+)
+def score_chunk_task(self, job_id: int, index: int, start: int, end: int):
+    service = Container.bulk_scoring_service()
+    job: BulkScoringJobORM = service.get_by_id(job_id)
+    target = bulk_scoring.part_path(job.output_path, index)
+    if target.exists():
+        return
+    try:
+        servers = Container.inference_service().inference_repository.get_all_by_linked_model_id(job.model_id)
+        if not servers:
+            raise InferenceException(detail='No inference servers available!', status_code=404)
+        server = servers[index % len(servers)]
+        client = SyncInferenceClient(server.current_host, server.current_port)
+        try:
+            results = bulk_scoring.score_lines(
+                client,
+                bulk_scoring.read_chunk(job.input_path, start, end),
+                first_line=index * job.chunk_rows
             )
+        finally:
+            client.close()
+    except (InferenceException, httpx.HTTPError) as e:
+        if self.request.retries >= self.max_retries:
+            service.set_state(job_id, BulkScoringJobORM.JobState.FAILED)
+            raise
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
+    bulk_scoring.write_part(target, results)
+    done_chunks = bulk_scoring.count_parts(job.output_path)
+    service.record_progress(job_id, done_chunks)
+    if done_chunks >= job.total_chunks:
+        finish_bulk_scoring_task.delay(job_id)
+
+
+@celery_app.task(
+    queue='default_q',
+    name='finish_bulk_scoring_task'
+)
+def finish_bulk_scoring_task(job_id: int):
+    service = Container.bulk_scoring_service()
+    job: BulkScoringJobORM = service.get_by_id(job_id)
+    if job.state == BulkScoringJobORM.JobState.DONE.value:
+        return
+    try:
+        bulk_scoring.merge_parts(job.output_path, job.total_chunks)
+    except FileNotFoundError:
+        # two writers can both see the last part land, the other finish already merged and removed the parts
+        if bulk_scoring.parts_dir(job.output_path).exists():
+            raise
+    service.set_state(job_id, BulkScoringJobORM.JobState.DONE)
+    logger.info(f'Bulk scoring job {job_id} written to {job.output_path}')
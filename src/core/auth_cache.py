@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from src.model.models import User
+from src.schema.auth_schema import Payload
+
+
+class AuthCache:
+    """
+    In-process cache for the authentication dependencies. Verified token
+    payloads are kept until the token expires, at most `max_tokens` of them,
+    so a repeated token skips the HMAC check. Users are kept for `ttl`
+    seconds and dropped early by `invalidate` when their balance, active or
+    superuser flag changes. Dependencies run in the thread pool, hence the lock.
+    """
+    TOPIC = 'auth'
+
+    def __init__(self, ttl: float, max_tokens: int):
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self._tokens: OrderedDict[str, tuple[float, Payload]] = OrderedDict()
+        self._users: dict[int, tuple[float, User]] = {}
+        self._lock = threading.Lock()
+
+    def payload(self, token: str, decoder: Callable[[str], dict]) -> Payload:
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry and entry[0] > time.time():
+                self._tokens.move_to_end(token)
+                return entry[1]
+        decoded = decoder(token)
+        payload = Payload(**decoded)
+        if 'exp' not in decoded:
+            # a token without `exp` is not cached
+            return payload
+        with self._lock:
+            self._tokens[token] = (decoded['exp'], payload)
+            if len(self._tokens) > self.max_tokens:
+                self._tokens.popitem(last=False)
+        return payload
+
+    def user(self, user_id: int, loader: Callable[[int], User]) -> User:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry and entry[0] > now:
+                return entry[1]
+        user = loader(user_id)
+        with self._lock:
+            self._users[user_id] = (now + self.ttl, user)
+        return user
+
+    def invalidate(self, user_id: int | None = None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
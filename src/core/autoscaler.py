@@ -0,0 +1,76 @@
+"""
+Replica planning for the autoscaler. Every pass compares the load the API
+reports for a model with its AutoscalingPolicyORM:
+
+- in-flight and queued requests per replica above `target_in_flight`, requests per
+  second per replica above `target_rps`, or the slowest replica above
+  `target_latency_ms` while the model has traffic ask for more replicas;
+- a model without replicas that still gets requests asks for one, the API
+  counts the requests it had to turn away, so a model scaled to zero wakes up;
+- the result is clamped to [min_replicas, max_replicas];
+- replicas are started at most every `scale_up_cooldown` seconds and retired
+  at most every `scale_down_cooldown` seconds, and only replicas that have
+  been idle for `idle_seconds` are retired.
+
+STARTING servers count as replicas so a slow start does not trigger more
+starts, and nothing is retired while a replica is still starting.
+"""
+import dataclasses
+import math
+
+from src.model.models import AutoscalingPolicyORM, InferenceServerORM
+
+
+@dataclasses.dataclass
+class ScalingDecision:
+    start: int = 0
+    retire: list[int] = dataclasses.field(default_factory=list)
+
+
+def request_rate(policy: AutoscalingPolicyORM, requests: int, now: float) -> float | None:
+    """Requests per second since the previous pass, None on the first pass or after the API restarted."""
+    if policy.last_sampled_at is None or requests < policy.last_request_count:
+        return None
+    elapsed = now - policy.last_sampled_at
+    return (requests - policy.last_request_count) / elapsed if elapsed > 0 else None
+
+
+def desired_replicas(policy: AutoscalingPolicyORM, metrics: dict, rate: float | None, current: int) -> int:
+    # requests waiting for admission are load the replicas could not take
+    desired = math.ceil((metrics['in_flight'] + metrics.get('queued', 0)) / policy.target_in_flight)
+    if policy.target_rps and rate is not None:
+        desired = max(desired, math.ceil(rate / policy.target_rps))
+    # the latency EWMA keeps its last value once traffic stops, only trust it while requests come in
+    busy = metrics['in_flight'] or metrics.get('queued', 0) or rate
+    if policy.target_latency_ms and busy and metrics['latency_ms'] > policy.target_latency_ms:
+        desired = max(desired, current + 1)
+    # with no replica nothing is in flight or measured, the turned away requests are the only load
+    if not current and rate:
+        desired = max(desired, 1)
+    return min(max(desired, policy.min_replicas), policy.max_replicas)
+
+
+def plan(policy: AutoscalingPolicyORM, metrics: dict, servers: list[InferenceServerORM],
+         rate: float | None, now: float) -> ScalingDecision:
+    alive = [server for server in servers if server.server_state == InferenceServerORM.ServerState.ALIVE.value]
+    starting = [server for server in servers if server.server_state == InferenceServerORM.ServerState.STARTING.value]
+    current = len(alive) + len(starting)
+    desired = desired_replicas(policy, metrics, rate, current)
+    since_scaled = now - policy.last_scaled_at if policy.last_scaled_at is not None else math.inf
+
+    if desired > current and since_scaled >= policy.scale_up_cooldown:
+        return ScalingDecision(start=desired - current)
+    if desired < current and not starting and since_scaled >= policy.scale_down_cooldown:
+        replicas = {replica['id']: replica for replica in metrics['replicas']}
+
+        def idle(server: InferenceServerORM) -> bool:
+            # a replica the API has not seen a request for since it started is idle too
+            replica = replicas.get(server.id)
+            if replica is None:
+                return True
+            if replica['in_flight']:
+                return False
+            return replica['idle_seconds'] is None or replica['idle_seconds'] >= policy.idle_seconds
+
+        return ScalingDecision(retire=[server.id for server in alive if idle(server)][:current - desired])
+    return ScalingDecision()
@@ -0,0 +1,123 @@
+"""
+File handling for offline bulk scoring. A job reads a JSONL file whose
+lines look like `{"input_tensor": [[...], ...], ...}` and writes one JSONL
+line per input line: every field except the tensor, the line number and
+either the prediction or an error.
+
+Each chunk is written to its own part file via an atomic rename, so a
+part that exists is complete; a resumed job only scores missing parts.
+Progress is the number of part files, so a chunk delivered twice is only
+counted once.
+"""
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from src.core.classification_models.InferenceClient import SyncInferenceClient
+from src.core.config import configs
+
+
+def chunk_offsets(input_path: str, chunk_rows: int) -> Iterator[tuple[int, int]]:
+    """Yields byte ranges of consecutive `chunk_rows`-line chunks, one line in memory at a time."""
+    with open(input_path, 'rb') as f:
+        start, rows = 0, 0
+        for _ in iter(f.readline, b''):
+            rows += 1
+            if rows == chunk_rows:
+                end = f.tell()
+                yield start, end
+                start, rows = end, 0
+        if rows:
+            yield start, f.tell()
+
+
+def read_chunk(input_path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(input_path, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            yield f.readline()
+
+
+def parts_dir(output_path: str) -> pathlib.Path:
+    return pathlib.Path(f'{output_path}.parts')
+
+
+def part_path(output_path: str, index: int) -> pathlib.Path:
+    return parts_dir(output_path) / f'part-{index:06d}.jsonl'
+
+
+def _predict(client: SyncInferenceClient, tensor: np.ndarray) -> list:
+    response = client.predict_tensor(tensor, configs.INFERENCE_WIRE_FORMAT)
+    response.raise_for_status()
+    body = response.json()
+    if 'prediction' not in body:
+        raise ValueError(body.get('message', body))
+    return body['prediction']
+
+
+def score_lines(client: SyncInferenceClient, lines: Iterable[bytes], first_line: int) -> list[dict]:
+    """Scores all valid lines with one request; falls back to one request per line if the model rejects it."""
+    results, tensors = [], []
+    for number, line in enumerate(lines, start=first_line):
+        try:
+            record = json.loads(line)
+            tensor = np.asarray(record.pop('input_tensor'), dtype=float)
+            if tensor.ndim != 2:
+                raise ValueError(f'expected a 2-D tensor, got shape {tensor.shape}')
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            results.append({'line': number, 'error': str(e)})
+            continue
+        results.append({**record, 'line': number})
+        tensors.append((results[-1], tensor))
+    if not tensors:
+        return results
+    try:
+        predictions = _predict(client, np.concatenate([tensor for _, tensor in tensors]))
+        offsets = np.cumsum([0] + [len(tensor) for _, tensor in tensors])
+        for (result, _), start, end in zip(tensors, offsets[:-1], offsets[1:]):
+            result['prediction'] = predictions[start:end]
+    except ValueError:
+        for result, tensor in tensors:
+            try:
+                result['prediction'] = _predict(client, tensor)
+            except ValueError as e:
+                result['error'] = str(e)
+    return results
+
+
+def write_part(target: pathlib.Path, results: list[dict]):
+    # a redelivered chunk may be scored by two workers at once, each writes a file of its own
+    fd, temporary = tempfile.mkstemp(dir=target.parent, prefix=f'{target.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def count_parts(output_path: str) -> int:
+    with os.scandir(parts_dir(output_path)) as entries:
+        return sum(entry.name.startswith('part-') and entry.name.endswith('.jsonl') for entry in entries)
+
+
+def merge_parts(output_path: str, total_chunks: int):
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, temporary = tempfile.mkstemp(dir=output_dir, prefix=f'{os.path.basename(output_path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            for index in range(total_chunks):
+                with open(part_path(output_path, index), 'rb') as part:
+                    shutil.copyfileobj(part, output)
+        os.replace(temporary, output_path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    shutil.rmtree(parts_dir(output_path), ignore_errors=True)
@@ -0,0 +1,93 @@
+import asyncio
+import collections
+from contextlib import asynccontextmanager
+
+
+class Overloaded(Exception):
+    ...
+
+
+class _Gate:
+    """Concurrency limit of one model with a FIFO of waiting requests."""
+
+    def __init__(self):
+        self.limit = 0
+        self.active = 0
+        self.shed = 0
+        self.waiters: collections.deque[asyncio.Future] = collections.deque()
+
+    def resize(self, limit: int):
+        self.limit = limit
+        while self.active < self.limit and self._hand_over():
+            self.active += 1
+
+    def _hand_over(self) -> bool:
+        # waiters that timed out are cancelled futures, skip them
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return True
+        return False
+
+    async def acquire(self, queue_limit: int, timeout: float):
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return
+        if len(self.waiters) >= queue_limit:
+            self.shed += 1
+            raise Overloaded()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot arrived together with the deadline, pass it on
+                self.release()
+            self.shed += 1
+            raise Overloaded()
+        except asyncio.CancelledError:
+            # the client went away, possibly after `release` handed this waiter its slot
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        # the slot goes straight to the next waiter, `active` only drops when nobody waits
+        if self.active > self.limit or not self._hand_over():
+            self.active -= 1
+
+
+class AdmissionController:
+    """
+    Bounds the predictions a model has in flight to `replica_limit` per ALIVE
+    replica, and never more than `model_limit`. Requests over the limit wait
+    in a FIFO of at most `queue_limit` entries. A request that cannot start
+    within `queue_timeout` seconds, or finds the queue full, raises
+    `Overloaded`, so a slow model sheds load instead of holding API
+    connections until the client gives up.
+    """
+
+    def __init__(self, model_limit: int, replica_limit: int, queue_limit: int, queue_timeout: float):
+        self.model_limit = model_limit
+        self.replica_limit = replica_limit
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self._gates: dict[int, _Gate] = {}
+
+    @asynccontextmanager
+    async def admit(self, model_id: int, replicas: int):
+        gate = self._gates.setdefault(model_id, _Gate())
+        gate.resize(min(self.model_limit, self.replica_limit * replicas))
+        await gate.acquire(self.queue_limit, self.queue_timeout)
+        try:
+            yield
+        finally:
+            gate.release()
+
+    def stats(self, model_id: int) -> dict:
+        gate = self._gates.get(model_id)
+        if gate is None:
+            return {'queued': 0, 'shed': 0}
+        return {'queued': sum(not waiter.done() for waiter in gate.waiters), 'shed': gate.shed}
@@ -1,7 +1,11 @@
-from typing import Generic, TypeVar, Union
+import asyncio
+from typing import ClassVar, Generic, TypeVar, Union
 
 import httpx
 
+from src.core.classification_models.inference_server import tensor_codec
+from src.core.config import configs
+
 _AvailableClients = TypeVar(
     '_AvailableClients',
     bound=Union[httpx.AsyncClient, httpx.Client]
@@ -18,6 +22,16 @@ class BaseClient(Generic[_AvailableClients]):
     def predict(self, input_data: dict):
         return self._client.post('/api/v2/predict/', json=input_data, timeout=(5, 30))
 
+    def predict_tensor(self, tensor, content_type: str = tensor_codec.NPY_CONTENT_TYPE):
+        if content_type == tensor_codec.JSON_CONTENT_TYPE:
+            return self.predict({'input_tensor': tensor.tolist()})
+        return self._client.post(
+            '/api/v2/predict/',
+            content=tensor_codec.encode_tensor(tensor, content_type),
+            headers={'Content-Type': content_type},
+            timeout=(5, 30)
+        )
+
     def health_check(self):
         return self._client.get('/api/v2/healthcheck', timeout=(5, 30))
 
@@ -26,3 +40,56 @@ class SyncInferenceClient(BaseClient[httpx.Client]):
     def __init__(self, host, port):
         self._client = httpx.Client(base_url=self.base_url(host, port))
 
+    def close(self):
+        self._client.close()
+
+
+class AsyncInferenceClient(BaseClient[httpx.AsyncClient]):
+    """
+    Keep-alive client shared by every request to one inference server.
+    Use `pooled` instead of the constructor so connections are reused.
+    """
+    _pools: ClassVar[dict[tuple[str, int], 'AsyncInferenceClient']] = {}
+    # closes of replaced clients, referenced until they finish
+    _closing: ClassVar[set[asyncio.Task]] = set()
+
+    def __init__(self, host, port, uds: str | None = None):
+        self.uds = uds
+        limits = httpx.Limits(
+            max_connections=configs.INFERENCE_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=configs.INFERENCE_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=configs.INFERENCE_POOL_KEEPALIVE_EXPIRY,
+        )
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url(host, port),
+            # with `uds` requests keep the TCP address as Host, only the connection goes over the socket
+            transport=httpx.AsyncHTTPTransport(uds=uds, limits=limits),
+        )
+
+    @classmethod
+    def pooled(cls, host, port, uds: str | None = None) -> 'AsyncInferenceClient':
+        key = (host, int(port))
+        client = cls._pools.get(key)
+        if client is None or client._client.is_closed or client.uds != uds:
+            if client is not None and not client._client.is_closed:
+                # the replica restarted on another socket, its old connections are of no use
+                task = asyncio.get_running_loop().create_task(client.aclose())
+                cls._closing.add(task)
+                task.add_done_callback(cls._closing.discard)
+            client = cls._pools[key] = cls(host, port, uds)
+        return client
+
+    @classmethod
+    async def close_pool(cls, host, port):
+        client = cls._pools.pop((host, int(port)), None)
+        if client is not None:
+            await client.aclose()
+
+    @classmethod
+    async def close_all(cls):
+        while cls._pools:
+            _, client = cls._pools.popitem()
+            await client.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -1,11 +1,74 @@
 import dataclasses
+import json
 import os
 import pathlib
 import socket
 import subprocess
 import sys
+import tempfile
+
+from src.core.classification_models.PortAllocator import PortAllocator
+from src.core.classification_models.inference_server.to_joblib import NOT_MAPPED
 
 BASE_INFERENCE_TEMPLATE_PATH = pathlib.Path(__file__).parent / 'inference_server' / 'model_template.py'
+TO_JOBLIB_PATH = pathlib.Path(__file__).parent / 'inference_server' / 'to_joblib.py'
+JOBLIB_SUFFIX = '.joblib'
+NOT_MAPPED_SUFFIX = '.not-mapped'
+
+
+def to_joblib_artifact(model_file: str, timeout: float) -> str:
+    """
+    Re-saves a pickled model next to the original as an uncompressed joblib
+    artifact, which the template memory-maps instead of unpickling. The
+    conversion runs in a subprocess, see to_joblib.py. Returns the original
+    path when the model cannot be converted, or when its arrays would not
+    stay mapped; the latter is remembered in `<file>.not-mapped`.
+    """
+    if model_file.endswith(JOBLIB_SUFFIX):
+        return model_file
+    artifact = model_file + JOBLIB_SUFFIX
+    for marker, result in ((artifact, artifact), (model_file + NOT_MAPPED_SUFFIX, model_file)):
+        if os.path.exists(marker) and os.path.getmtime(marker) >= os.path.getmtime(model_file):
+            return result
+    # concurrent deploys of one model each write a file of their own and the last rename wins
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(artifact), prefix=os.path.basename(artifact) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        converted = subprocess.run(
+            [sys.executable, str(TO_JOBLIB_PATH), model_file, tmp],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=timeout,
+        )
+        if converted.returncode == 0:
+            os.replace(tmp, artifact)
+            return artifact
+        if converted.returncode == NOT_MAPPED:
+            pathlib.Path(model_file + NOT_MAPPED_SUFFIX).touch()
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return model_file
+
+
+def bind_unix_socket(path: str, backlog: int) -> socket.socket:
+    # the path is named after a leased port, so a file left there belongs to a dead server
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(backlog)
+    return sock
+
+
+@dataclasses.dataclass
+class WarmProcess:
+    process: subprocess.Popen
+    # our end of the SOCK_SEQPACKET pair the process waits on for its assignment
+    control: socket.socket
 
 
 @dataclasses.dataclass
@@ -13,42 +76,83 @@ class InferenceServer:
     model_file: pathlib.Path
     port: int
     host: str
+    # micro-batching is enabled in the template when batch_max_size > 1
+    batch_max_size: int = 0
+    batch_max_wait_us: int = 0
+    # forked uvicorn workers sharing the loaded model
+    workers: int = 1
+    # leased from PortAllocator, handed to the server process and closed here
+    listen_socket: socket.socket | None = None
+    # served next to the TCP port for clients on the same host
+    socket_path: str | None = None
+    unix_socket: socket.socket | None = None
 
-    def run_inference_server(self, health_check_info: dict | None = None):
-        print(
-            {
-                'PKL_MODEL_PATH': self.model_file,
-                'PORT': str(self.port),
-                'HOST': self.host,
-                'PATH': os.getenv("PATH"),
-                **(health_check_info or {})
-            }
-        )
-        return subprocess.Popen(
-            ['python', BASE_INFERENCE_TEMPLATE_PATH],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            env={
-                'PKL_MODEL_PATH': self.model_file,
-                'PORT': str(self.port),
-                'HOST': self.host,
-                'PATH': os.getenv("PATH"),
-                **(health_check_info or {})
-            }
-        )
-
-    @classmethod
-    def detect_free_port(cls, host):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        for port in range(1024, 1070):
-            try:
-                sock.bind((host, port))
+    def run_inference_server(self, health_check_info: dict | None = None, warm_pool=None):
+        environment = {
+            'PKL_MODEL_PATH': str(self.model_file),
+            'PORT': str(self.port),
+            'HOST': self.host,
+            'BATCH_MAX_SIZE': str(self.batch_max_size),
+            'BATCH_MAX_WAIT_US': str(self.batch_max_wait_us),
+            'WORKERS': str(self.workers),
+            'PATH': os.getenv("PATH"),
+            **(health_check_info or {})
+        }
+        print(environment)
+        sockets = [sock for sock in (self.listen_socket, self.unix_socket) if sock is not None]
+        fds = [sock.fileno() for sock in sockets]
+        try:
+            warm = warm_pool.acquire() if warm_pool is not None else None
+            if warm is not None:
+                socket.send_fds(warm.control, [json.dumps(environment).encode()], fds)
+                warm.control.close()
+                return warm.process
+            if fds:
+                environment['LISTEN_FDS'] = ','.join(map(str, fds))
+            # nothing reads the server's output, a pipe would fill up with access logs and block it
+            return subprocess.Popen(
+                ['python', BASE_INFERENCE_TEMPLATE_PATH],
+                stdout=subprocess.DEVNULL,
+                env=environment,
+                pass_fds=fds
+            )
+        finally:
+            for sock in sockets:
                 sock.close()
-                return port
-            except OSError:
-                continue
+
+    @staticmethod
+    def start_warm(imports: str = '') -> WarmProcess:
+        """
+        Starts a template process that imports its dependencies and then waits
+        on a control socket for the environment of the server it should become
+        and the listening sockets it should serve on.
+        """
+        control, child_control = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        with child_control:
+            process = subprocess.Popen(
+                ['python', BASE_INFERENCE_TEMPLATE_PATH],
+                stdout=subprocess.DEVNULL,
+                env={
+                    'WARM_POOL': '1',
+                    'WARM_IMPORTS': imports,
+                    'WARM_CONTROL_FD': str(child_control.fileno()),
+                    'PATH': os.getenv("PATH")
+                },
+                pass_fds=[child_control.fileno()]
+            )
+        return WarmProcess(process, control)
 
     @classmethod
-    def from_generated(cls, model_file):
+    def from_generated(cls, model_file, port_allocator: PortAllocator, taken_ports: set[int],
+                       socket_dir: str | None = None, **options):
         host = '0.0.0.0'
-        port = cls.detect_free_port(host)
-        return cls(model_file, port, host)
+        port, listen_socket = port_allocator.lease(host, taken_ports)
+        socket_path, unix_socket = None, None
+        if socket_dir:
+            socket_path = os.path.join(socket_dir, f'inference-{port}.sock')
+            unix_socket = bind_unix_socket(socket_path, port_allocator.backlog)
+        return cls(
+            model_file, port, host,
+            listen_socket=listen_socket, socket_path=socket_path, unix_socket=unix_socket,
+            **options
+        )
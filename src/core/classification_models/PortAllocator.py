@@ -0,0 +1,39 @@
+import random
+import socket
+
+
+class PortRangeExhausted(Exception):
+    ...
+
+
+class PortAllocator:
+    """
+    Leases ports for inference servers from [first_port, last_port]. A lease
+    is a socket that is already bound and listening, so once `lease` returns
+    the port belongs to the caller. Handing the socket to the server process
+    leaves no window in which another deploy could take the port. Ports
+    recorded on servers that are not DEAD are skipped. A DEAD server's port
+    becomes free again when its process, and with it the socket, is gone.
+    """
+
+    def __init__(self, first_port: int, last_port: int, backlog: int = 2048):
+        self.ports = range(first_port, last_port + 1)
+        self.backlog = backlog
+
+    def lease(self, host: str, taken: set[int]) -> tuple[int, socket.socket]:
+        # start at a random offset so concurrent deploys rarely contend for the same port
+        offset = random.randrange(len(self.ports))
+        for i in range(len(self.ports)):
+            port = self.ports[(offset + i) % len(self.ports)]
+            if port in taken:
+                continue
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind((host, port))
+                sock.listen(self.backlog)
+            except OSError:
+                sock.close()
+                continue
+            return port, sock
+        raise PortRangeExhausted(f'no free port in {self.ports.start}-{self.ports.stop - 1}')
@@ -0,0 +1,74 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    LRU cache of model responses for models with `cache_predictions` set,
+    keyed by model id and a hash of the canonical input tensor. Entries
+    expire after `ttl` seconds and the total size of stored responses is
+    kept under `max_bytes`.
+
+    A hit is billed and logged as a `Prediction` like any other call, with
+    the server that computed the cached response as its predictor.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[int, bytes], tuple[float, int, int, float, dict]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model_id: int, input_tensor: np.ndarray) -> tuple[int, bytes]:
+        # float64, C order, and -0.0 folded into 0.0, whatever the wire format was
+        canonical = np.ascontiguousarray(input_tensor, dtype='<f8') + 0.0
+        digest = hashlib.blake2b(canonical.data, digest_size=16)
+        digest.update(repr(canonical.shape).encode())
+        return model_id, digest.digest()
+
+    def get(self, key: tuple[int, bytes]) -> tuple[int, float, dict] | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        _, _, server_id, cost, response = entry
+        return server_id, cost, response
+
+    def put(self, key: tuple[int, bytes], server_id: int, cost: float, response: dict, size: int):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, server_id, cost, response)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, model_id: int | None = None):
+        for key in [key for key in self._entries if model_id is None or key[0] == model_id]:
+            self._drop(key)
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def _drop(self, key: tuple[int, bytes]):
+        self._bytes -= self._entries.pop(key)[1]
@@ -0,0 +1,151 @@
+import asyncio
+import collections
+import dataclasses
+import random
+import time
+from contextlib import asynccontextmanager
+
+from src.model.models import InferenceServerORM
+
+
+@dataclasses.dataclass
+class ReplicaStats:
+    in_flight: int = 0
+    latency_ewma: float = 0.0
+    requests: int = 0
+    # time.monotonic() of the last finished request, 0 when never used
+    last_used: float = 0.0
+
+
+class ReplicaRouter:
+    """
+    Live view of the ALIVE replicas of every model. Each prediction goes to
+    the replica with the lowest (in-flight + 1) * latency EWMA, so a slow
+    replica gets less traffic as soon as its requests start piling up.
+    A replica without an answer yet is scored with the mean EWMA of its
+    model, and a failed request counts as at least `failure_penalty`
+    seconds, so neither a fresh nor a failing replica attracts every request.
+    The latencies of the last `latency_window` successful requests of a
+    model are kept to tell when a request runs long enough to be hedged.
+    The API serves from one event loop, so the counters need no locking.
+    """
+
+    def __init__(self, ewma_alpha: float, latency_window: int = 512, failure_penalty: float = 1.0):
+        self.ewma_alpha = ewma_alpha
+        self.failure_penalty = failure_penalty
+        self.latency_window = latency_window
+        self._replicas: dict[int, list[InferenceServerORM]] = {}
+        self._stats: dict[int, ReplicaStats] = {}
+        self._requests: dict[int, int] = {}
+        self._latencies: dict[int, collections.deque[float]] = {}
+
+    def update(self, model_id: int, servers: list[InferenceServerORM]) -> list[InferenceServerORM]:
+        """Replaces the replica set of a model and returns the replicas that left it."""
+        server_ids = {server.id for server in servers}
+        removed = [server for server in self._replicas.get(model_id, []) if server.id not in server_ids]
+        self._replicas[model_id] = list(servers)
+        live_ids = {server.id for replicas in self._replicas.values() for server in replicas}
+        for server_id in list(self._stats):
+            if server_id not in live_ids and not self._stats[server_id].in_flight:
+                del self._stats[server_id]
+        return removed
+
+    def discard(self, server: InferenceServerORM) -> bool:
+        """Takes `server` out of rotation, False when it already was."""
+        replicas = self._replicas.get(server.linked_model_id, [])
+        self._replicas[server.linked_model_id] = [replica for replica in replicas if replica.id != server.id]
+        return len(self._replicas[server.linked_model_id]) < len(replicas)
+
+    def count_unroutable(self, model_id: int):
+        """Counts a request that found no replica, so a model scaled to zero still shows demand."""
+        self._requests[model_id] = self._requests.get(model_id, 0) + 1
+
+    def replicas(self, model_id: int) -> list[InferenceServerORM]:
+        return self._replicas.get(model_id, [])
+
+    def stats(self, server_id: int) -> ReplicaStats:
+        return self._stats.setdefault(server_id, ReplicaStats())
+
+    def choose(self, model_id: int, max_in_flight: int | None = None,
+               exclude: set[int] = frozenset()) -> InferenceServerORM | None:
+        replicas = [server for server in self.replicas(model_id) if server.id not in exclude]
+        if not replicas:
+            return None
+        if max_in_flight is not None:
+            # fall back to every replica when the set changed under an admitted request
+            replicas = [s for s in replicas if self.stats(s.id).in_flight < max_in_flight] or replicas
+        known = [self.stats(server.id).latency_ewma for server in replicas if self.stats(server.id).latency_ewma]
+        # with no latency known at all the score is the in-flight count alone
+        seed = sum(known) / len(known) if known else 1.0
+        return min(replicas, key=lambda server: (self._load(server.id, seed), random.random()))
+
+    def latency_quantile(self, model_id: int, q: float, min_samples: int = 20) -> float | None:
+        """Latency in seconds below which `q` of the recent requests finished, None without enough samples."""
+        latencies = self._latencies.get(model_id)
+        if not latencies or len(latencies) < min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def _load(self, server_id: int, seed: float) -> float:
+        stats = self.stats(server_id)
+        return (stats.in_flight + 1) * (stats.latency_ewma or seed)
+
+    def _observe(self, stats: ReplicaStats, elapsed: float):
+        if stats.latency_ewma:
+            stats.latency_ewma += self.ewma_alpha * (elapsed - stats.latency_ewma)
+        else:
+            stats.latency_ewma = elapsed
+
+    def metrics(self) -> list[dict]:
+        """Load of every model as the autoscaler reads it: request totals, in-flight requests and latencies."""
+        now = time.monotonic()
+        models = []
+        for model_id in self._replicas.keys() | self._requests.keys():
+            replicas = [
+                {
+                    'id': server.id,
+                    'in_flight': stats.in_flight,
+                    'latency_ms': stats.latency_ewma * 1000,
+                    'requests': stats.requests,
+                    'idle_seconds': now - stats.last_used if stats.last_used else None,
+                }
+                for server in self.replicas(model_id)
+                for stats in [self.stats(server.id)]
+            ]
+            models.append({
+                'model_id': model_id,
+                'requests': self._requests.get(model_id, 0),
+                'in_flight': sum(replica['in_flight'] for replica in replicas),
+                'latency_ms': max((replica['latency_ms'] for replica in replicas), default=0.0),
+                'replicas': replicas,
+            })
+        return models
+
+    @asynccontextmanager
+    async def track(self, server: InferenceServerORM):
+        stats = self.stats(server.id)
+        stats.in_flight += 1
+        stats.requests += 1
+        self._requests[server.linked_model_id] = self._requests.get(server.linked_model_id, 0) + 1
+        started = time.perf_counter()
+        try:
+            yield stats
+        except asyncio.CancelledError:
+            # a lost hedge or an expired deadline: the replica took at least this long
+            elapsed = time.perf_counter() - started
+            if elapsed > stats.latency_ewma:
+                self._observe(stats, elapsed)
+            raise
+        except Exception:
+            self._observe(stats, max(time.perf_counter() - started, self.failure_penalty))
+            raise
+        else:
+            elapsed = time.perf_counter() - started
+            self._observe(stats, elapsed)
+            self._latencies.setdefault(
+                server.linked_model_id, collections.deque(maxlen=self.latency_window)
+            ).append(elapsed)
+        finally:
+            stats.in_flight -= 1
+            stats.last_used = time.monotonic()
@@ -0,0 +1,55 @@
+import time
+from typing import Awaitable, Callable
+
+from src.model.models import ClassificationModelORM, InferenceServerORM
+
+
+class RoutingCache:
+    """
+    In-process TTL cache of model rows and ALIVE server sets for the predict
+    path, filled by async loaders so a miss never blocks the event loop.
+    Server state changes drop entries early through `invalidate`; a
+    model without live servers is cached for `negative_ttl` only, so a new
+    deployment is picked up quickly even if its invalidation is lost.
+    """
+    TOPIC = 'routing'
+
+    def __init__(self, ttl: float, negative_ttl: float):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._models: dict[int, tuple[float, ClassificationModelORM]] = {}
+        self._servers: dict[int, tuple[float, list[InferenceServerORM]]] = {}
+
+    async def model(self, model_id: int,
+                    loader: Callable[[int], Awaitable[ClassificationModelORM]]) -> ClassificationModelORM:
+        entry = self._models.get(model_id)
+        now = time.monotonic()
+        if entry and entry[0] > now:
+            return entry[1]
+        model = await loader(model_id)
+        self._models[model_id] = (now + self.ttl, model)
+        return model
+
+    async def servers(self, model_id: int,
+                      loader: Callable[[int], Awaitable[list[InferenceServerORM]]]) -> list[InferenceServerORM]:
+        entry = self._servers.get(model_id)
+        now = time.monotonic()
+        if entry and entry[0] > now:
+            return entry[1]
+        servers = await loader(model_id)
+        self._servers[model_id] = (now + (self.ttl if servers else self.negative_ttl), servers)
+        return servers
+
+    def discard_server(self, server: InferenceServerORM):
+        """Drops one server from the cached set without reloading it, the set keeps its expiry."""
+        entry = self._servers.get(server.linked_model_id)
+        if entry:
+            self._servers[server.linked_model_id] = (entry[0], [s for s in entry[1] if s.id != server.id])
+
+    def invalidate(self, model_id: int | None = None):
+        if model_id is None:
+            self._models.clear()
+            self._servers.clear()
+        else:
+            self._models.pop(model_id, None)
+            self._servers.pop(model_id, None)
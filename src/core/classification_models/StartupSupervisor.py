@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import subprocess
+import threading
+from typing import Callable
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class StartupSupervisor:
+    """
+    Waits for freshly started inference servers on an event loop of its own,
+    so a cold start task only has to spawn the process. A server is ready once
+    `/api/v2/healthcheck` answers with its model id. It is given up on when the
+    process exits or `timeout` passes. Probes back off from `initial_delay`
+    to `max_delay`. One supervisor watches any number of servers at once.
+    """
+
+    def __init__(self, timeout: float, initial_delay: float, max_delay: float):
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name='startup-supervisor', daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+    def watch(self, process: subprocess.Popen, host: str, port: int, model_id: int,
+              on_ready: Callable[[bool], None]):
+        """Schedules the probe and returns at once; `on_ready` runs in a worker thread of the loop."""
+        self.start()
+        asyncio.run_coroutine_threadsafe(self._supervise(process, host, port, model_id, on_ready), self._loop)
+
+    async def _supervise(self, process, host, port, model_id, on_ready):
+        loop = asyncio.get_running_loop()
+        ready = await self._wait_ready(process, f'http://{host}:{port}/api/v2/healthcheck', model_id)
+        if not ready and process.poll() is None:
+            process.terminate()
+        try:
+            await loop.run_in_executor(None, on_ready, ready)
+        except Exception:
+            logger.exception('Reporting the start of the server on port %s failed', port)
+
+    async def _wait_ready(self, process, url: str, model_id: int) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        delay = self.initial_delay
+        async with httpx.AsyncClient(timeout=self.max_delay) as client:
+            while process.poll() is None and loop.time() < deadline:
+                try:
+                    response = await client.get(url)
+                    if response.status_code == 200 and response.json().get('linked_model_id') == model_id:
+                        return True
+                except (httpx.HTTPError, ValueError):
+                    pass
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+        return False
@@ -0,0 +1,73 @@
+import threading
+from collections import deque
+
+from src.core.classification_models.InferenceServer import InferenceServer, WarmProcess
+
+
+class WarmPool:
+    """
+    Idle template processes that have already imported FastAPI, uvicorn and
+    `imports`, waiting on a control socket for the server they should become.
+    A deploy takes one with `acquire` and the pool tops itself up in a
+    background thread, so only the first deploy after a start pays for the
+    interpreter.
+    """
+
+    def __init__(self, size: int, imports: str = ''):
+        self.size = size
+        self.imports = imports
+        self._idle: deque[WarmProcess] = deque()
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self.size <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refill, name='warm-pool', daemon=True)
+        self._thread.start()
+        self._wanted.set()
+
+    def acquire(self) -> WarmProcess | None:
+        """Hands out a live idle process, or None when the pool is empty."""
+        self.start()
+        process = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.popleft()
+                if candidate.process.poll() is None:
+                    process = candidate
+                    break
+                candidate.control.close()
+        self._wanted.set()
+        return process
+
+    def close(self):
+        self._closed = True
+        self._wanted.set()
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for warm in idle:
+            warm.control.close()
+            warm.process.terminate()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def _refill(self):
+        while not self._closed:
+            self._wanted.wait()
+            self._wanted.clear()
+            while not self._closed:
+                with self._lock:
+                    self._idle = deque(warm for warm in self._idle if warm.process.poll() is None)
+                    if len(self._idle) >= self.size:
+                        break
+                warm = InferenceServer.start_warm(self.imports)
+                with self._lock:
+                    if self._closed:
+                        warm.control.close()
+                        warm.process.terminate()
+                        break
+                    self._idle.append(warm)
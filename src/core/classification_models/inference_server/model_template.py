@@ -1,10 +1,22 @@
+import asyncio
+import gc
+import importlib
+import json
 import os
 import pickle
+import signal
+import socket
+import sys
+import time
 import typing
 
+import joblib
+import numpy as np
 import pydantic
 import uvicorn
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request
+
+import tensor_codec
 
 if typing.TYPE_CHECKING:
     pass
@@ -20,7 +32,78 @@ class ModelPipeline:
         return infer_response
 
 
+class MicroBatcher:
+    """
+    Collects concurrent requests until `max_batch_size` rows are queued or
+    `max_wait_us` has passed since the first one, runs them as one
+    `ModelPipeline.infer` call and hands every caller its own rows back.
+    """
+
+    def __init__(self, pipeline: ModelPipeline, max_batch_size: int, max_wait_us: int):
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1_000_000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+
+    def start(self):
+        self._worker = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+
+    async def infer(self, input_tensor: typing.Iterable):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((np.asarray(input_tensor), future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while rows < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            await loop.run_in_executor(None, self._run_batch, batch)
+
+    def _run_batch(self, batch: list):
+        tensors = [tensor for tensor, _ in batch]
+        try:
+            prediction = self.pipeline.infer(np.concatenate(tensors))
+            results = np.split(prediction, np.cumsum([len(tensor) for tensor in tensors])[:-1])
+        except Exception:
+            # one malformed request must not fail its neighbours
+            results = []
+            for tensor in tensors:
+                try:
+                    results.append(self.pipeline.infer(tensor))
+                except Exception as e:
+                    results.append(e)
+        for (_, future), result in zip(batch, results):
+            future.get_loop().call_soon_threadsafe(self._resolve, future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result):
+        if future.done():
+            return
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
 model_pipeline = None
+batcher = None
 
 
 class PredictionResponse(pydantic.BaseModel):
@@ -41,13 +124,42 @@ class HealthCheck(pydantic.BaseModel):
     linked_model_id: int
 
 
+async def read_input_tensor(request: Request):
+    body = await request.body()
+    content_type = tensor_codec.media_type(request.headers.get('content-type'))
+    try:
+        if content_type in tensor_codec.BINARY_CONTENT_TYPES:
+            return tensor_codec.decode_tensor(body, content_type)
+        return InferenceRequest.model_validate_json(body).input_tensor
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 app = FastAPI(debug=True)
 
 
-@app.post('/api/v2/predict/')
-async def predict(inference_request: InferenceRequest) -> PredictionResponse | ErrorResponse:
+@app.on_event('startup')
+async def start_batcher():
+    global batcher
+    max_batch_size = int(os.getenv('BATCH_MAX_SIZE', 0))
+    if max_batch_size > 1:
+        batcher = MicroBatcher(model_pipeline, max_batch_size, int(os.getenv('BATCH_MAX_WAIT_US', 2000)))
+        batcher.start()
+
+
+@app.on_event('shutdown')
+async def stop_batcher():
+    if batcher is not None:
+        await batcher.stop()
+
+
+@app.post('/api/v2/predict/', openapi_extra=tensor_codec.openapi_request_body(InferenceRequest.model_json_schema()))
+async def predict(input_tensor=Depends(read_input_tensor)) -> PredictionResponse | ErrorResponse:
     try:
-        model_response = model_pipeline.infer(inference_request.input_tensor)
+        if batcher is not None:
+            model_response = await batcher.infer(input_tensor)
+        else:
+            model_response = model_pipeline.infer(input_tensor)
         return {'prediction': model_response}
     except Exception as e:
         return {
@@ -62,8 +174,118 @@ async def health_check() -> HealthCheck:
     return {'linked_model_id': int(os.getenv('LINKED_MODEL_ID', -1))}
 
 
+# a worker that exits this soon after its fork counts as a fast exit; respawns after fast exits
+# back off exponentially, and after RESPAWN_MAX_FAST_EXITS in a row the server gives up
+RESPAWN_FAST_EXIT_SECONDS = 5.0
+RESPAWN_INITIAL_DELAY = 0.1
+RESPAWN_MAX_DELAY = 10.0
+RESPAWN_MAX_FAST_EXITS = 5
+
+
+def serve_forked(config: uvicorn.Config, workers: int, sockets: list[socket.socket]):
+    """
+    Forks `workers` uvicorn servers that accept on the same listening sockets.
+    The model is already loaded, so children share its pages copy-on-write.
+    A worker that dies is forked again. Once workers keep dying right after
+    the fork, the whole server exits with 1, so the health sweep sees it go
+    instead of a crash loop burning the host's CPU.
+    """
+    # keep the collector from touching (and so copying) the model's objects in children
+    gc.freeze()
+    children: dict[int, float] = {}
+    stopping = False
+    fast_exits = 0
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            # uvicorn exits with SystemExit when it cannot start, it must not unwind into the parent's loop
+            try:
+                uvicorn.Server(config).run(sockets=sockets)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    while children:
+        pid, _ = os.wait()
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        fast_exits = fast_exits + 1 if time.monotonic() - started < RESPAWN_FAST_EXIT_SECONDS else 0
+        if fast_exits >= RESPAWN_MAX_FAST_EXITS:
+            print(f'{fast_exits} workers in a row exited right after start, giving up', file=sys.stderr)
+            shutdown(None, None)
+            continue
+        if fast_exits:
+            time.sleep(min(RESPAWN_INITIAL_DELAY * 2 ** (fast_exits - 1), RESPAWN_MAX_DELAY))
+            if stopping:
+                continue
+        spawn()
+    if fast_exits >= RESPAWN_MAX_FAST_EXITS:
+        sys.exit(1)
+
+
+def listen_sockets(config: uvicorn.Config) -> list[socket.socket]:
+    # the launcher leases the port by binding it and passes the socket down, with a unix socket next to it
+    listen_fds = os.getenv('LISTEN_FDS')
+    if listen_fds:
+        return [socket.socket(fileno=int(fd)) for fd in listen_fds.split(',')]
+    return [config.bind_socket()]
+
+
+def serve(workers: int):
+    config = uvicorn.Config(app, port=int(os.getenv('PORT')), host=os.getenv('HOST'))
+    sockets = listen_sockets(config)
+    if workers > 1:
+        serve_forked(config, workers, sockets)
+    else:
+        uvicorn.Server(config).run(sockets=sockets)
+
+
+def load_model(model_path: str):
+    if model_path.endswith('.joblib'):
+        # numpy buffers stay in the page cache, shared by every replica of the model on this host
+        return joblib.load(model_path, mmap_mode='r')
+    with open(model_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def wait_for_assignment():
+    """
+    Warm pool mode: imports the modules a model is likely to need, then blocks
+    until the launcher sends the server environment as one JSON message on the
+    control socket, together with the listening sockets of the leased port.
+    """
+    for module in filter(None, os.getenv('WARM_IMPORTS', '').split(',')):
+        try:
+            importlib.import_module(module.strip())
+        except ImportError:
+            pass
+    with socket.socket(fileno=int(os.getenv('WARM_CONTROL_FD'))) as control:
+        assignment, fds, _, _ = socket.recv_fds(control, 65536, 2)
+    if not assignment:
+        # the pool owner went away before handing us a model
+        sys.exit(0)
+    os.environ.update(json.loads(assignment))
+    if fds:
+        os.environ['LISTEN_FDS'] = ','.join(map(str, fds))
+
+
 if __name__ == '__main__':
-    with open(os.getenv('PKL_MODEL_PATH'), 'rb') as f:
-        pkl_model = pickle.load(f)
-    model_pipeline = ModelPipeline(pkl_model)
-    uvicorn.run(app, port=int(os.getenv('PORT')), host=os.getenv('HOST'))
+    if os.getenv('WARM_POOL'):
+        wait_for_assignment()
+    model_pipeline = ModelPipeline(load_model(os.getenv('PKL_MODEL_PATH')))
+    serve(int(os.getenv('WORKERS', 1)))
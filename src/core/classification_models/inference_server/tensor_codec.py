@@ -0,0 +1,78 @@
+"""
+Wire formats for input tensors, shared by the API and model_template.py.
+The template imports this file as a sibling module, so it must not depend
+on anything from `src`.
+"""
+import io
+
+import numpy as np
+
+JSON_CONTENT_TYPE = 'application/json'
+NPY_CONTENT_TYPE = 'application/x-npy'
+# little-endian uint32 rows, uint32 columns, then rows * columns float32
+F32_CONTENT_TYPE = 'application/x-tensor-f32'
+BINARY_CONTENT_TYPES = (NPY_CONTENT_TYPE, F32_CONTENT_TYPE)
+
+_F32_HEADER = np.dtype('<u4')
+_F32_HEADER_SIZE = 2 * _F32_HEADER.itemsize
+_F32_ITEM = np.dtype('<f4')
+
+
+def media_type(content_type: str | None) -> str:
+    return (content_type or JSON_CONTENT_TYPE).split(';', 1)[0].strip().lower()
+
+
+def openapi_request_body(json_schema: dict) -> dict:
+    binary = {'schema': {'type': 'string', 'format': 'binary'}}
+    return {
+        'requestBody': {
+            'required': True,
+            'content': {
+                JSON_CONTENT_TYPE: {'schema': json_schema},
+                NPY_CONTENT_TYPE: binary,
+                F32_CONTENT_TYPE: binary,
+            },
+        }
+    }
+
+
+def encode_tensor(tensor, content_type: str) -> bytes:
+    tensor = np.asarray(tensor)
+    if tensor.ndim != 2:
+        raise ValueError(f'expected a 2-D tensor, got shape {tensor.shape}')
+    if content_type == F32_CONTENT_TYPE:
+        header = np.array(tensor.shape, dtype=_F32_HEADER).tobytes()
+        return header + np.ascontiguousarray(tensor, dtype=_F32_ITEM).tobytes()
+    if content_type == NPY_CONTENT_TYPE:
+        buffer = io.BytesIO()
+        np.save(buffer, tensor, allow_pickle=False)
+        return buffer.getvalue()
+    raise ValueError(f'unsupported tensor encoding: {content_type}')
+
+
+def decode_tensor(body: bytes, content_type: str) -> np.ndarray:
+    """Returns a read-only view over `body`; the payload is not copied."""
+    if content_type == F32_CONTENT_TYPE:
+        if len(body) < _F32_HEADER_SIZE:
+            raise ValueError('tensor header is truncated')
+        rows, columns = (int(i) for i in np.frombuffer(body, dtype=_F32_HEADER, count=2))
+        if len(body) != _F32_HEADER_SIZE + rows * columns * _F32_ITEM.itemsize:
+            raise ValueError(f'payload size does not match shape ({rows}, {columns})')
+        return np.frombuffer(body, dtype=_F32_ITEM, offset=_F32_HEADER_SIZE).reshape(rows, columns)
+    if content_type == NPY_CONTENT_TYPE:
+        header = io.BytesIO(body)
+        version = np.lib.format.read_magic(header)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+        if dtype.hasobject:
+            raise ValueError('object arrays are not accepted')
+        if len(shape) != 2:
+            raise ValueError(f'expected a 2-D tensor, got shape {shape}')
+        count = shape[0] * shape[1]
+        if len(body) != header.tell() + count * dtype.itemsize:
+            raise ValueError(f'payload size does not match shape {shape}')
+        tensor = np.frombuffer(body, dtype=dtype, count=count, offset=header.tell())
+        return tensor.reshape(shape, order='F' if fortran_order else 'C')
+    raise ValueError(f'unsupported tensor encoding: {content_type}')
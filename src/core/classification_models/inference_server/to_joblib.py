@@ -0,0 +1,62 @@
+"""
+Re-saves a pickled model as an uncompressed joblib artifact. Runs in a
+process of its own, so a broken or huge pickle cannot take down the worker
+that deploys it.
+
+usage: to_joblib.py <model file> <artifact>
+
+Exits with 0 when the artifact is worth serving, that is when loading it
+with mmap_mode='r' leaves most of its bytes memory-mapped. Estimators that
+copy their arrays into buffers of their own on load, like sklearn trees,
+exit with NOT_MAPPED and keep being served from the pickle.
+"""
+import mmap
+import os
+import pickle
+import sys
+
+import joblib
+import numpy as np
+
+NOT_MAPPED = 3
+MIN_MAPPED_SHARE = 0.5
+MAX_DEPTH = 64
+
+
+def is_mapped(array: np.ndarray) -> bool:
+    base = array
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return True
+        base = getattr(base, 'base', None)
+    return False
+
+
+def mapped_bytes(obj, seen: set[int], depth: int = 0) -> int:
+    if id(obj) in seen or depth > MAX_DEPTH:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes if obj.dtype != object and is_mapped(obj) else 0
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        children = obj
+    elif hasattr(obj, '__dict__'):
+        children = vars(obj).values()
+    else:
+        return 0
+    return sum(mapped_bytes(child, seen, depth + 1) for child in children)
+
+
+def main(model_file: str, artifact: str) -> int:
+    with open(model_file, 'rb') as f:
+        model = pickle.load(f)
+    joblib.dump(model, artifact, compress=0)
+    del model
+    mapped = mapped_bytes(joblib.load(artifact, mmap_mode='r'), set())
+    return 0 if mapped >= MIN_MAPPED_SHARE * os.path.getsize(artifact) else NOT_MAPPED
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1], sys.argv[2]))
@@ -33,6 +33,14 @@ class Configs(BaseSettings):
     # auth
     SECRET_KEY: str = os.getenv("SECRET_KEY", "key")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 30  # 60 minutes * 24 hours * 30 days = 30 days
+    # authenticated users are cached this many seconds, verified tokens until they expire
+    AUTH_CACHE_TTL: float = float(os.getenv("AUTH_CACHE_TTL", 5))
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+    # thread pools for blocking calls from handlers, see src.core.executors
+    AUTH_EXECUTOR_WORKERS: int = int(os.getenv("AUTH_EXECUTOR_WORKERS", 2))
+    AUTH_EXECUTOR_QUEUE: int = int(os.getenv("AUTH_EXECUTOR_QUEUE", 64))
+    DB_EXECUTOR_WORKERS: int = int(os.getenv("DB_EXECUTOR_WORKERS", 16))
+    DB_EXECUTOR_QUEUE: int = int(os.getenv("DB_EXECUTOR_QUEUE", 1024))
 
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
@@ -55,9 +63,93 @@ class Configs(BaseSettings):
            port=DB_PORT,
            database=os.getenv('DB'),
         )
+        # the async repositories talk to the same database through asyncpg
+        ASYNC_DATABASE_URI = DATABASE_URI.replace("postgresql://", "postgresql+asyncpg://", 1)
 
     else:
         DATABASE_URI = "sqlite:///{dbfile}".format(dbfile=DB_FILE)
+        ASYNC_DATABASE_URI = "sqlite+aiosqlite:///{dbfile}".format(dbfile=DB_FILE)
+
+    # connection pool of every engine: the API runs a sync and an async one, Celery, Dash and the nav app one each
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    # seconds before a connection is replaced, -1 keeps connections forever
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # log pool gauges and checkout waits this often in seconds, 0 disables
+    DB_POOL_STATS_INTERVAL: float = float(os.getenv("DB_POOL_STATS_INTERVAL", 60))
+
+    # inference
+    INFERENCE_POOL_MAX_CONNECTIONS: int = int(os.getenv("INFERENCE_POOL_MAX_CONNECTIONS", 64))
+    INFERENCE_POOL_MAX_KEEPALIVE: int = int(os.getenv("INFERENCE_POOL_MAX_KEEPALIVE", 16))
+    INFERENCE_POOL_KEEPALIVE_EXPIRY: float = float(os.getenv("INFERENCE_POOL_KEEPALIVE_EXPIRY", 30))
+    # one of application/json, application/x-npy, application/x-tensor-f32
+    INFERENCE_WIRE_FORMAT: str = os.getenv("INFERENCE_WIRE_FORMAT", "application/x-npy")
+    ROUTING_CACHE_TTL: float = float(os.getenv("ROUTING_CACHE_TTL", 30))
+    ROUTING_NEGATIVE_TTL: float = float(os.getenv("ROUTING_NEGATIVE_TTL", 2))
+    PREDICTION_CACHE_MAX_BYTES: int = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    PREDICTION_CACHE_TTL: float = float(os.getenv("PREDICTION_CACHE_TTL", 600))
+    REPLICA_LATENCY_EWMA_ALPHA: float = float(os.getenv("REPLICA_LATENCY_EWMA_ALPHA", 0.3))
+    # seconds a failed request adds to the latency EWMA of its replica, at least
+    REPLICA_FAILURE_PENALTY: float = float(os.getenv("REPLICA_FAILURE_PENALTY", 1.0))
+    INFERENCE_CHUNK_ROWS: int = int(os.getenv("INFERENCE_CHUNK_ROWS", 512))
+    INFERENCE_CHUNK_CONCURRENCY: int = int(os.getenv("INFERENCE_CHUNK_CONCURRENCY", 8))
+    # serve models from uncompressed joblib artifacts loaded with mmap_mode='r'
+    INFERENCE_MMAP_MODELS: bool = os.getenv("INFERENCE_MMAP_MODELS", "true").lower() == "true"
+    INFERENCE_MMAP_CONVERT_TIMEOUT: float = float(os.getenv("INFERENCE_MMAP_CONVERT_TIMEOUT", 300))
+    INFERENCE_SERVER_WORKERS: int = int(os.getenv("INFERENCE_SERVER_WORKERS", 1))
+    INFERENCE_BATCH_MAX_SIZE: int = int(os.getenv("INFERENCE_BATCH_MAX_SIZE", 0))
+    INFERENCE_BATCH_MAX_WAIT_US: int = int(os.getenv("INFERENCE_BATCH_MAX_WAIT_US", 2000))
+    # uploaded model files are hashed and written to disk in buffers of this size
+    MODEL_UPLOAD_CHUNK_BYTES: int = int(os.getenv("MODEL_UPLOAD_CHUNK_BYTES", 1024 * 1024))
+    # ports leased to inference servers on this host, see PortAllocator
+    INFERENCE_PORT_RANGE_START: int = int(os.getenv("INFERENCE_PORT_RANGE_START", 20000))
+    INFERENCE_PORT_RANGE_END: int = int(os.getenv("INFERENCE_PORT_RANGE_END", 20999))
+    # servers also listen on a unix socket in this directory, empty serves TCP only
+    INFERENCE_SOCKET_DIR: str = os.getenv("INFERENCE_SOCKET_DIR", "/tmp/inference-sockets")
+    # the periodic health sweep probes this many servers at once, each with this timeout in seconds
+    HEALTH_CHECK_CONCURRENCY: int = int(os.getenv("HEALTH_CHECK_CONCURRENCY", 50))
+    HEALTH_CHECK_TIMEOUT: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2.0))
+    # a server goes DEAD only after this many failed probes in a row, HEALTH_CHECK_RETRY_DELAY seconds apart
+    HEALTH_CHECK_ATTEMPTS: int = int(os.getenv("HEALTH_CHECK_ATTEMPTS", 3))
+    HEALTH_CHECK_RETRY_DELAY: float = float(os.getenv("HEALTH_CHECK_RETRY_DELAY", 1.0))
+    # a starting server is probed with backoff until it answers or the timeout passes
+    SERVER_READY_TIMEOUT: float = float(os.getenv("SERVER_READY_TIMEOUT", 60))
+    SERVER_READY_PROBE_INITIAL_DELAY: float = float(os.getenv("SERVER_READY_PROBE_INITIAL_DELAY", 0.02))
+    SERVER_READY_PROBE_MAX_DELAY: float = float(os.getenv("SERVER_READY_PROBE_MAX_DELAY", 1.0))
+    # idle template processes kept by every cold start worker process, 0 disables the pool
+    WARM_POOL_SIZE: int = int(os.getenv("WARM_POOL_SIZE", 2))
+    WARM_POOL_IMPORTS: str = os.getenv("WARM_POOL_IMPORTS", "sklearn.ensemble,sklearn.linear_model,sklearn.tree")
+    # admission control: predictions in flight per ALIVE replica, capped per model
+    INFERENCE_MAX_IN_FLIGHT_PER_REPLICA: int = int(os.getenv("INFERENCE_MAX_IN_FLIGHT_PER_REPLICA", 32))
+    INFERENCE_MAX_IN_FLIGHT_PER_MODEL: int = int(os.getenv("INFERENCE_MAX_IN_FLIGHT_PER_MODEL", 256))
+    # requests over the limit wait in a queue of this size for at most INFERENCE_QUEUE_TIMEOUT seconds, then get a 503
+    INFERENCE_QUEUE_LIMIT: int = int(os.getenv("INFERENCE_QUEUE_LIMIT", 256))
+    INFERENCE_QUEUE_TIMEOUT: float = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", 1.0))
+    # Retry-After in seconds of the 503 answers of saturated queues and pools
+    INFERENCE_RETRY_AFTER: int = int(os.getenv("INFERENCE_RETRY_AFTER", 1))
+    # failover: a prediction is retried on up to INFERENCE_MAX_ATTEMPTS replicas within the deadline in seconds
+    INFERENCE_REQUEST_DEADLINE: float = float(os.getenv("INFERENCE_REQUEST_DEADLINE", 10))
+    INFERENCE_MAX_ATTEMPTS: int = int(os.getenv("INFERENCE_MAX_ATTEMPTS", 3))
+    # send a duplicate to a second replica once a prediction runs past the model's p95 latency
+    INFERENCE_HEDGE: bool = os.getenv("INFERENCE_HEDGE", "false").lower() == "true"
+
+    # autoscaler: reads GET /inference/metrics with the X-Metrics-Key header every AUTOSCALE_INTERVAL seconds
+    METRICS_API_KEY: str = os.getenv("METRICS_API_KEY", "")
+    AUTOSCALER_METRICS_URL: str = os.getenv("AUTOSCALER_METRICS_URL", "")
+    AUTOSCALE_INTERVAL: float = float(os.getenv("AUTOSCALE_INTERVAL", 15))
+    # a retired server is out of rotation this long before it is stopped
+    AUTOSCALE_DRAIN_SECONDS: float = float(os.getenv("AUTOSCALE_DRAIN_SECONDS", 10))
+
+    # prediction logging: "sync", "group" or "async", see src.core.write_buffer.WriteMode
+    PREDICTION_WRITE_MODE: str = os.getenv("PREDICTION_WRITE_MODE", "group")
+    PREDICTION_WRITE_BATCH: int = int(os.getenv("PREDICTION_WRITE_BATCH", 500))
+    PREDICTION_WRITE_DELAY: float = float(os.getenv("PREDICTION_WRITE_DELAY", 0.05))
+    PREDICTION_WRITE_MAX_PENDING: int = int(os.getenv("PREDICTION_WRITE_MAX_PENDING", 10000))
+
+    # broker, also used to fan out cache invalidations to the API processes
+    CELERY_BROKER: str | None = os.getenv("CELERY_BROKER")
 
     # find query
     PAGE = 1
@@ -1,13 +1,29 @@
 from dependency_injector import containers, providers
 
+from src.core.classification_models.AdmissionController import AdmissionController
+from src.core.classification_models.PortAllocator import PortAllocator
+from src.core.classification_models.PredictionCache import PredictionCache
+from src.core.classification_models.ReplicaRouter import ReplicaRouter
+from src.core.classification_models.RoutingCache import RoutingCache
+from src.core.classification_models.StartupSupervisor import StartupSupervisor
+from src.core.classification_models.WarmPool import WarmPool
+from src.core.auth_cache import AuthCache
 from src.core.config import configs
-from src.core.database import Database
+from src.core.database import AsyncDatabase, Database
+from src.core.executors import BoundedExecutor
+from src.core.invalidation import InvalidationListener
+from src.core.write_buffer import WriteBehindBuffer
 from src.repository import *
-from src.repository.classificator_repository import ClassificatorRepository
+from src.repository.autoscaling_repository import AutoscalingPolicyRepository
+from src.repository.bulk_scoring_repository import BulkScoringJobRepository
+from src.repository.classificator_repository import AsyncClassificatorRepository, ClassificatorRepository
 from src.repository.inference_server_repository import InferenceServerRepository
 from src.repository.prediction_repository import PredictionRepository
+from src.repository.user_repository import AsyncUserRepository
 from src.services import *
-from src.services.classificator_service import ClassificatorService
+from src.services.autoscaling_service import AutoscalingService
+from src.services.bulk_scoring_service import BulkScoringService
+from src.services.classificator_service import AsyncClassificatorService, ClassificatorService
 from src.services.inference_service import InferenceService
 from src.services.prediction_service import PredictionService
 
@@ -21,7 +37,17 @@ class Container(containers.DeclarativeContainer):
         ]
     )
 
-    db = providers.Singleton(Database, db_url=configs.DATABASE_URI)
+    pool_options = providers.Dict(
+        pool_size=configs.DB_POOL_SIZE,
+        max_overflow=configs.DB_MAX_OVERFLOW,
+        pool_timeout=configs.DB_POOL_TIMEOUT,
+        pool_recycle=configs.DB_POOL_RECYCLE,
+        pool_pre_ping=configs.DB_POOL_PRE_PING,
+    )
+
+    db = providers.Singleton(Database, db_url=configs.DATABASE_URI, pool_options=pool_options)
+
+    async_db = providers.Singleton(AsyncDatabase, db_url=configs.ASYNC_DATABASE_URI, pool_options=pool_options)
 
     user_repository = providers.Factory(UserRepository, session_factory=db.provided.session)
 
@@ -31,13 +57,105 @@ class Container(containers.DeclarativeContainer):
 
     classificator_repository = providers.Factory(ClassificatorRepository, session_factory=db.provided.session)
 
-    user_service = providers.Factory(UserService, user_repository=user_repository)
+    bulk_scoring_repository = providers.Factory(BulkScoringJobRepository, session_factory=db.provided.session)
+
+    autoscaling_repository = providers.Factory(AutoscalingPolicyRepository, session_factory=db.provided.session)
+
+    async_user_repository = providers.Factory(AsyncUserRepository, session_factory=async_db.provided.session)
+
+    async_classificator_repository = providers.Factory(
+        AsyncClassificatorRepository, session_factory=async_db.provided.session
+    )
+
+    prediction_writer = providers.Singleton(
+        WriteBehindBuffer,
+        writer=prediction_repository.provided.create_many,
+        mode=configs.PREDICTION_WRITE_MODE,
+        max_batch=configs.PREDICTION_WRITE_BATCH,
+        max_delay=configs.PREDICTION_WRITE_DELAY,
+        max_pending=configs.PREDICTION_WRITE_MAX_PENDING
+    )
+
+    auth_cache = providers.Singleton(AuthCache, ttl=configs.AUTH_CACHE_TTL, max_tokens=configs.AUTH_TOKEN_CACHE_SIZE)
+
+    user_service = providers.Factory(UserService, user_repository=user_repository, auth_cache=auth_cache)
 
     auth_service = providers.Factory(AuthService, user_repository=user_repository)
 
-    inference_service = providers.Factory(InferenceService, inference_repository=inference_repository)
+    invalidation_listener = providers.Singleton(InvalidationListener, broker_url=configs.CELERY_BROKER)
+
+    auth_executor = providers.Singleton(
+        BoundedExecutor, name='auth', workers=configs.AUTH_EXECUTOR_WORKERS, max_queue=configs.AUTH_EXECUTOR_QUEUE
+    )
+
+    db_executor = providers.Singleton(
+        BoundedExecutor, name='db', workers=configs.DB_EXECUTOR_WORKERS, max_queue=configs.DB_EXECUTOR_QUEUE
+    )
+
+    replica_router = providers.Singleton(
+        ReplicaRouter,
+        ewma_alpha=configs.REPLICA_LATENCY_EWMA_ALPHA,
+        failure_penalty=configs.REPLICA_FAILURE_PENALTY
+    )
+
+    routing_cache = providers.Singleton(
+        RoutingCache,
+        ttl=configs.ROUTING_CACHE_TTL,
+        negative_ttl=configs.ROUTING_NEGATIVE_TTL
+    )
+
+    prediction_cache = providers.Singleton(
+        PredictionCache,
+        max_bytes=configs.PREDICTION_CACHE_MAX_BYTES,
+        ttl=configs.PREDICTION_CACHE_TTL
+    )
+
+    warm_pool = providers.Singleton(WarmPool, size=configs.WARM_POOL_SIZE, imports=configs.WARM_POOL_IMPORTS)
+
+    startup_supervisor = providers.Singleton(
+        StartupSupervisor,
+        timeout=configs.SERVER_READY_TIMEOUT,
+        initial_delay=configs.SERVER_READY_PROBE_INITIAL_DELAY,
+        max_delay=configs.SERVER_READY_PROBE_MAX_DELAY
+    )
+
+    port_allocator = providers.Singleton(
+        PortAllocator,
+        first_port=configs.INFERENCE_PORT_RANGE_START,
+        last_port=configs.INFERENCE_PORT_RANGE_END
+    )
+
+    admission_controller = providers.Singleton(
+        AdmissionController,
+        model_limit=configs.INFERENCE_MAX_IN_FLIGHT_PER_MODEL,
+        replica_limit=configs.INFERENCE_MAX_IN_FLIGHT_PER_REPLICA,
+        queue_limit=configs.INFERENCE_QUEUE_LIMIT,
+        queue_timeout=configs.INFERENCE_QUEUE_TIMEOUT
+    )
+
+    inference_service = providers.Factory(
+        InferenceService,
+        inference_repository=inference_repository,
+        async_user_repository=async_user_repository,
+        replica_router=replica_router,
+        routing_cache=routing_cache,
+        prediction_cache=prediction_cache,
+        warm_pool=warm_pool,
+        startup_supervisor=startup_supervisor,
+        port_allocator=port_allocator,
+        admission_controller=admission_controller,
+        db_executor=db_executor
+    )
 
     prediction_service = providers.Factory(PredictionService, prediction_repository=prediction_repository)
 
     classificator_service = providers.Factory(ClassificatorService, classificator_repository=classificator_repository)
 
+    async_classificator_service = providers.Factory(
+        AsyncClassificatorService, classificator_repository=async_classificator_repository
+    )
+
+    bulk_scoring_service = providers.Factory(BulkScoringService, bulk_scoring_repository=bulk_scoring_repository)
+
+    autoscaling_service = providers.Factory(AutoscalingService, autoscaling_repository=autoscaling_repository)
+
@@ -1,11 +1,14 @@
-from contextlib import AbstractContextManager, contextmanager
+from contextlib import AbstractAsyncContextManager, AbstractContextManager, asynccontextmanager, contextmanager
 from typing import Any, Callable
 
 from sqlalchemy import create_engine, orm
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
 from sqlalchemy.orm import Session
 from sqlmodel import SQLModel
 
+from src.core.pool_telemetry import TimedAsyncQueuePool, TimedQueuePool
+
 
 @as_declarative()
 class BaseModel:
@@ -19,8 +22,8 @@ class BaseModel:
 
 
 class Database:
-    def __init__(self, db_url: str) -> None:
-        self._engine = create_engine(db_url)
+    def __init__(self, db_url: str, pool_options: dict | None = None) -> None:
+        self._engine = create_engine(db_url, poolclass=TimedQueuePool, **(pool_options or {}))
         self._session_factory = orm.scoped_session(
             orm.sessionmaker(
                 autocommit=False,
@@ -45,3 +48,39 @@ class Database:
 
     def pers_session(self):
         return self._session_factory()
+
+    def pool_stats(self) -> dict:
+        return self._engine.pool.telemetry.snapshot(self._engine.pool)
+
+
+class AsyncDatabase:
+    """
+    The same database behind an async engine. Sessions are plain per-call
+    `AsyncSession`s, a scoped session has no meaning without threads, and
+    rows stay readable after commit since nothing can lazy load them later.
+    """
+
+    def __init__(self, db_url: str, pool_options: dict | None = None) -> None:
+        self._engine = create_async_engine(db_url, poolclass=TimedAsyncQueuePool, **(pool_options or {}))
+        self._session_factory = async_sessionmaker(
+            bind=self._engine,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+
+    @asynccontextmanager
+    async def session(self) -> Callable[..., AbstractAsyncContextManager[AsyncSession]]:
+        session: AsyncSession = self._session_factory()
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+    async def dispose(self) -> None:
+        await self._engine.dispose()
+
+    def pool_stats(self) -> dict:
+        return self._engine.pool.telemetry.snapshot(self._engine.pool)
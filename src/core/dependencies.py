@@ -1,28 +1,34 @@
+import hmac
+
 from dependency_injector.wiring import inject, Provide
 from fastapi import Depends, Header
 import jwt
 from pydantic import ValidationError
 
+from src.core.auth_cache import AuthCache
 from src.core.config import configs
 from src.core.container import Container
 from src.core.exceptions import AuthError
 from src.core.security import ALGORITHM, JWTBearer
 from src.model.models import User
-from src.schema.auth_schema import Payload
 from src.services.user_service import UserService
 
 
+def decode_token(token: str) -> dict:
+    return jwt.decode(token, configs.SECRET_KEY, algorithms=ALGORITHM)
+
+
 @inject
 def get_current_user(
         token: str = Header(JWTBearer),
         service: UserService = Depends(Provide[Container.user_service]),
+        auth_cache: AuthCache = Depends(Provide[Container.auth_cache]),
 ) -> User:
     try:
-        payload = jwt.decode(token, configs.SECRET_KEY, algorithms=ALGORITHM)
-        token_data = Payload(**payload)
+        token_data = auth_cache.payload(token, decode_token)
     except (jwt.exceptions.PyJWTError, ValidationError):
         raise AuthError(detail="Could not validate credentials")
-    current_user: User = service.get_by_id(token_data.id)
+    current_user: User = auth_cache.user(token_data.id, service.get_by_id)
     if not current_user:
         raise AuthError(detail="User not found")
     return current_user
@@ -37,18 +43,23 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
 def get_current_user_with_no_exception(
         token: str = Depends(JWTBearer()),
         service: UserService = Depends(Provide[Container.user_service]),
+        auth_cache: AuthCache = Depends(Provide[Container.auth_cache]),
 ) -> User | None:
     try:
-        payload = jwt.decode(token, configs.SECRET_KEY, algorithms=ALGORITHM)
-        token_data = Payload(**payload)
+        token_data = auth_cache.payload(token, decode_token)
     except (jwt.exceptions.PyJWTError, ValidationError):
         return None
-    current_user: User = service.get_by_id(token_data.id)
+    current_user: User = auth_cache.user(token_data.id, service.get_by_id)
     if not current_user:
         return None
     return current_user
 
 
+def verify_metrics_key(x_metrics_key: str | None = Header(default=None)):
+    if not configs.METRICS_API_KEY or not hmac.compare_digest(x_metrics_key or '', configs.METRICS_API_KEY):
+        raise AuthError(detail="Invalid metrics key")
+
+
 def get_current_super_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise AuthError("Inactive user")
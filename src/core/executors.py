@@ -0,0 +1,74 @@
+"""
+Bounded thread pools for the blocking work of the API. Handlers run on one
+event loop, so a bcrypt hash or a slow query called from an `async def`
+stalls every prediction of the worker. Such calls go through `run` on the
+pool of their kind instead:
+
+- `auth`: password hashing and sign-in, CPU bound;
+- `db`: synchronous repository calls.
+
+Each pool has its own threads, so a sign-in storm cannot starve the DB
+pool the predict path depends on. At most `workers + max_queue` calls are
+pending on a pool, the next one is refused with a 503.
+"""
+import asyncio
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from src.core.config import configs
+from src.core.exceptions import ServiceUnavailableError
+
+T = TypeVar('T')
+
+
+class BoundedExecutor:
+
+    def __init__(self, name: str, workers: int, max_queue: int, wait_window: int = 1024):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-pool')
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        # seconds calls spent queued before a thread picked them up
+        self._waits: collections.deque[float] = collections.deque(maxlen=wait_window)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise ServiceUnavailableError(
+                detail=f'The {self.name} pool is saturated, retry later',
+                headers={'Retry-After': str(configs.INFERENCE_RETRY_AFTER)}
+            )
+        submitted = time.perf_counter()
+
+        def call():
+            self._waits.append(time.perf_counter() - submitted)
+            return fn(*args, **kwargs)
+
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            self._pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        quantile = lambda q: waits[min(int(q * len(waits)), len(waits) - 1)] * 1000 if waits else 0.0
+        return {
+            'name': self.name,
+            'workers': self.workers,
+            'pending': self._pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'queue_wait_p50_ms': quantile(0.5),
+            'queue_wait_p95_ms': quantile(0.95),
+            'queue_wait_max_ms': waits[-1] * 1000 if waits else 0.0,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
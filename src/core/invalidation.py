@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import socket
+import threading
+from collections import defaultdict
+from typing import Any, Callable
+
+import kombu
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_EXCHANGE = kombu.Exchange('cache_invalidation', type='fanout', durable=False)
+
+
+def publish_invalidation(broker_url: str, topic: str, key: Any = None):
+    """
+    Tells every API process to drop cached entries of `topic` for `key`
+    (everything when `key` is None). Failures are only logged: the caches
+    expire on their own.
+    """
+    if not broker_url:
+        return
+    try:
+        with kombu.Connection(broker_url, connect_timeout=2) as connection:
+            connection.Producer().publish(
+                {'topic': topic, 'key': key},
+                exchange=INVALIDATION_EXCHANGE,
+                declare=[INVALIDATION_EXCHANGE],
+                serializer='json',
+                retry=True,
+                retry_policy={'max_retries': 2},
+            )
+    except Exception:
+        logger.exception('Could not publish %s invalidation for %s', topic, key)
+
+
+class InvalidationListener:
+    """
+    Consumes invalidations on a daemon thread and runs the subscribed
+    handlers on the event loop passed to `start`, so they never race with
+    request handlers.
+    """
+
+    def __init__(self, broker_url: str):
+        self.broker_url = broker_url
+        self._handlers: dict[str, list[Callable[[Any], None]]] = defaultdict(list)
+        self._stopped = threading.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def subscribe(self, topic: str, handler: Callable[[Any], None]):
+        self._handlers[topic].append(handler)
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._stopped.clear()
+        threading.Thread(target=self._consume, name='invalidation-listener', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _dispatch(self, topic: str, key: Any):
+        if self._stopped.is_set():
+            return
+        for handler in self._handlers.get(topic, []):
+            self._loop.call_soon_threadsafe(handler, key)
+
+    def _on_message(self, body: dict, message):
+        self._dispatch(body.get('topic'), body.get('key'))
+
+    def _consume(self):
+        while not self._stopped.is_set():
+            try:
+                with kombu.Connection(self.broker_url, connect_timeout=2) as connection:
+                    queue = kombu.Queue(exchange=INVALIDATION_EXCHANGE, exclusive=True, auto_delete=True)
+                    with connection.Consumer(queue, callbacks=[self._on_message], accept=['json'], no_ack=True):
+                        # anything published while we were disconnected is lost
+                        for topic in list(self._handlers):
+                            self._dispatch(topic, None)
+                        while not self._stopped.is_set():
+                            try:
+                                connection.drain_events(timeout=1)
+                            except socket.timeout:
+                                continue
+            except Exception:
+                logger.exception('Invalidation listener lost its broker connection')
+                self._stopped.wait(5)
@@ -0,0 +1,66 @@
+"""
+Content-addressed storage for uploaded model files. An upload is streamed
+into a temporary file under MODEL_FILE_ROOT while it is hashed, then renamed
+to `<sha256><suffix>`. If an identical artifact is already stored, the new
+copy is dropped, so models with the same bytes share one file on disk and
+one memory-mapped joblib artifact next to it.
+"""
+import asyncio
+import hashlib
+import os
+import pathlib
+import re
+import uuid
+from typing import AsyncIterator
+
+from fastapi import UploadFile
+
+from src.core.config import configs
+
+SAFE_SUFFIX = re.compile(r'^\.[A-Za-z0-9]{1,16}$')
+
+
+def artifact_name(content_hash: str, filename: str | None) -> str:
+    # the suffix is kept because the template picks its loader by it
+    suffix = pathlib.PurePath(filename or '').suffix
+    return content_hash + (suffix if SAFE_SUFFIX.match(suffix) else '')
+
+
+async def iter_upload(upload: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await upload.read(configs.MODEL_UPLOAD_CHUNK_BYTES):
+        yield chunk
+
+
+def _write(f, digest, data: bytearray):
+    digest.update(data)
+    f.write(data)
+
+
+async def store_artifact(chunks: AsyncIterator[bytes], filename: str | None) -> tuple[str, str]:
+    """
+    Writes `chunks` to MODEL_FILE_ROOT one buffer at a time and returns the
+    SHA-256 of the content together with the name it is stored under.
+    """
+    root = pathlib.Path(os.getenv('MODEL_FILE_ROOT'))
+    tmp = root / f'.upload-{uuid.uuid4().hex}'
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    try:
+        with open(tmp, 'wb') as f:
+            async for chunk in chunks:
+                buffer += chunk
+                if len(buffer) >= configs.MODEL_UPLOAD_CHUNK_BYTES:
+                    await asyncio.to_thread(_write, f, digest, buffer)
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(_write, f, digest, buffer)
+        content_hash = digest.hexdigest()
+        name = artifact_name(content_hash, filename)
+        if (root / name).exists():
+            tmp.unlink()
+        else:
+            os.replace(tmp, root / name)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return content_hash, name
@@ -0,0 +1,130 @@
+"""
+Connection pool telemetry. The engines of Database and AsyncDatabase use the
+pools below, which time every checkout: how long a session waited for a
+connection goes into a histogram, and `snapshot` adds in-use, idle and
+overflow gauges. The API serves snapshots at GET /inference/metrics/pools,
+and every process can log them periodically with `PoolStatsLogger`. Use
+these numbers to size DB_POOL_SIZE and DB_MAX_OVERFLOW against the
+connection limit of Postgres.
+"""
+import bisect
+import logging
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+# SQLAlchemy logs the pools below under this module's name, the snapshots get a logger of their own
+logger = logging.getLogger(f'{__name__}.stats')
+
+# upper bounds of the checkout wait buckets in milliseconds, the last bucket is unbounded
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolTelemetry:
+
+    def __init__(self):
+        self.wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_sum_ms = 0.0
+        self.checkouts = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def observe(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_counts[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.wait_sum_ms += wait_ms
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def snapshot(self, pool: Pool) -> dict:
+        with self._lock:
+            buckets = [
+                {'le_ms': bound, 'count': count}
+                for bound, count in zip(WAIT_BUCKETS_MS + (None,), self.wait_counts)
+            ]
+            return {
+                'size': pool.size(),
+                'in_use': pool.checkedout(),
+                'idle': pool.checkedin(),
+                # negative until the pool has opened `size` connections
+                'overflow': max(pool.overflow(), 0),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'checkout_wait_sum_ms': self.wait_sum_ms,
+                'checkout_wait_buckets': buckets,
+            }
+
+
+class _TimedCheckout:
+    """Times `_do_get`, the call in which a queue pool blocks until a connection is free."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.telemetry.observe((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.telemetry.observe((time.perf_counter() - started) * 1000)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    ...
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    ...
+
+
+class PoolStatsLogger:
+    """
+    Logs the pool snapshots of `databases` every `interval` seconds from a
+    daemon thread. The processes leave this logger unconfigured, so it logs
+    at INFO to `handler`, or to stderr when no handler would get its records.
+    """
+
+    def __init__(self, interval: float, handler: logging.Handler | None = None, **databases):
+        self.interval = interval
+        self.handler = handler
+        self.databases = databases
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self._configure_logger()
+        self._stopped.clear()
+        threading.Thread(target=self._run, name='pool-stats', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _configure_logger(self):
+        if logger.level == logging.NOTSET:
+            logger.setLevel(logging.INFO)
+        if self.handler is not None:
+            if self.handler not in logger.handlers:
+                logger.addHandler(self.handler)
+        elif not logger.hasHandlers():
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+            logger.addHandler(handler)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            for name, database in self.databases.items():
+                stats = database.pool_stats()
+                logger.info(
+                    f"pool {name}: in_use={stats['in_use']} idle={stats['idle']} overflow={stats['overflow']} "
+                    f"checkouts={stats['checkouts']} timeouts={stats['timeouts']} "
+                    f"wait_sum_ms={stats['checkout_wait_sum_ms']:.1f}"
+                )
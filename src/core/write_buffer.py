@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class WriteMode:
+    # write every record on its own before returning, as before batching
+    SYNC = 'sync'
+    # batch records, but each caller waits until the batch holding its record is committed
+    GROUP = 'group'
+    # return at once; records still in the buffer are lost if the process dies
+    ASYNC = 'async'
+
+
+class WriteBehindBuffer:
+    """
+    Collects records and hands them to `writer` in batches of up to
+    `max_batch`, at least every `max_delay` seconds. Once `max_pending`
+    records are waiting, `add` blocks until a flush makes room.
+
+    In GROUP mode a record is written as soon as the writer is idle. Records
+    that arrive while a batch is being written join the next one, so callers
+    wait for at most one write in progress, never for `max_delay`.
+    """
+
+    def __init__(
+            self,
+            writer: Callable[[list], Any],
+            mode: str,
+            max_batch: int,
+            max_delay: float,
+            max_pending: int
+    ):
+        self.writer = writer
+        self.mode = mode
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._pending: list[tuple[Any, asyncio.Future | None]] = []
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._not_full = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.mode != WriteMode.SYNC:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            # holding the lock, the flusher is never cancelled in the middle of a write
+            async with self._flush_lock:
+                self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def add(self, record):
+        if self.mode == WriteMode.SYNC:
+            await asyncio.to_thread(self.writer, [record])
+            return
+        async with self._not_full:
+            await self._not_full.wait_for(lambda: len(self._pending) < self.max_pending)
+            future = asyncio.get_running_loop().create_future() if self.mode == WriteMode.GROUP else None
+            self._pending.append((record, future))
+        if self.mode == WriteMode.GROUP or len(self._pending) >= self.max_batch:
+            self._flush_requested.set()
+        if future is not None:
+            await future
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                try:
+                    await asyncio.to_thread(self.writer, [record for record, _ in batch])
+                except Exception as e:
+                    logger.exception('Could not write %s buffered records', len(batch))
+                    for _, future in batch:
+                        if future is not None and not future.done():
+                            future.set_exception(e)
+                else:
+                    for _, future in batch:
+                        if future is not None and not future.done():
+                            future.set_result(None)
+                finally:
+                    # cancelled mid-write, the callers of the batch must not wait forever
+                    for _, future in batch:
+                        if future is not None and not future.done():
+                            future.set_exception(RuntimeError('Flush cancelled, the records may not be written'))
+                async with self._not_full:
+                    self._not_full.notify_all()
+
+    async def _flush_periodically(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
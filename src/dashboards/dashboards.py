@@ -9,7 +9,9 @@ from dash.dependencies import Input, Output
 from sqlalchemy.sql.functions import count, func
 from sqlmodel import select, desc
 
+from src.core.config import configs
 from src.core.container import Container
+from src.core.pool_telemetry import PoolStatsLogger
 from src.dashboards.utils import created_vs_predicted_times_converter, server_upd_over_time_converter, \
     input_vs_output_converter, avg_server_cost
 from src.model.models import User, Prediction, InferenceServerORM, ClassificationModelORM
@@ -22,6 +24,7 @@ external_stylesheets = [dbc.themes.BOOTSTRAP, dbc.themes.DARKLY]
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 
 database = Container.db()
+PoolStatsLogger(configs.DB_POOL_STATS_INTERVAL, dashboards=database).start()
 
 app.layout = html.Div([
     dcc.Location(id='url', refresh=True),
@@ -4,8 +4,10 @@ import jinja2
 from flask import Flask, session, redirect, request
 from sqlmodel import select
 
+from src.core.config import configs
 from src.core.container import Container
 from src.core.exceptions import ValidationError, AuthError
+from src.core.pool_telemetry import PoolStatsLogger
 from src.model.models import ClassificationModelORM
 from src.schema.auth_schema import SignIn
 from src.schema.user_schema import User
@@ -21,6 +23,7 @@ jinja_env = jinja2.Environment(
 auth_service = Container().auth_service()
 user_service = Container().user_service()
 database = Container().db()
+PoolStatsLogger(configs.DB_POOL_STATS_INTERVAL, navigation_app=database).start()
 dashboard_fqdn = 'http://localhost:8050'
 
 
@@ -1,9 +1,15 @@
+import asyncio
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from src.api.v1.routes import routers as v1_routers
+from src.core.auth_cache import AuthCache
+from src.core.classification_models.InferenceClient import AsyncInferenceClient
+from src.core.classification_models.RoutingCache import RoutingCache
 from src.core.config import configs
 from src.core.container import Container
+from src.core.pool_telemetry import PoolStatsLogger
 from src.util.class_object import singleton
 
 
@@ -39,6 +45,45 @@ class AppCreator:
 
         self.app.include_router(v1_routers, prefix=configs.API_V1_STR)
 
+        @self.app.on_event("startup")
+        async def listen_for_invalidations():
+            if configs.CELERY_BROKER:
+                listener = self.container.invalidation_listener()
+                listener.subscribe(RoutingCache.TOPIC, self.container.routing_cache().invalidate)
+                listener.subscribe(AuthCache.TOPIC, self.container.auth_cache().invalidate)
+                listener.start(asyncio.get_running_loop())
+
+        self.pool_stats_logger = PoolStatsLogger(
+            configs.DB_POOL_STATS_INTERVAL, api=self.db, api_async=self.container.async_db()
+        )
+
+        @self.app.on_event("startup")
+        async def start_pool_stats_logger():
+            self.pool_stats_logger.start()
+
+        @self.app.on_event("startup")
+        async def start_prediction_writer():
+            self.container.prediction_writer().start()
+
+        @self.app.on_event("shutdown")
+        async def flush_prediction_writer():
+            await self.container.prediction_writer().stop()
+
+        @self.app.on_event("shutdown")
+        async def close_inference_pools():
+            self.container.invalidation_listener().stop()
+            await AsyncInferenceClient.close_all()
+
+        @self.app.on_event("shutdown")
+        async def stop_executors():
+            self.container.auth_executor().shutdown()
+            self.container.db_executor().shutdown()
+
+        @self.app.on_event("shutdown")
+        async def close_async_db():
+            self.pool_stats_logger.stop()
+            await self.container.async_db().dispose()
+
 
 app_creator = AppCreator()
 app = app_creator.app
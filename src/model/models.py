@@ -11,6 +11,9 @@ class ClassificationModelORM(SQLModel, table=True):
     updated_at: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now(), onupdate=func.now()))
     name: str = Field(unique=True)
     model_file: str = Field(sa_column=Column(String))
+    # SHA-256 of the uploaded file, rows with equal hashes share one artifact
+    content_hash: str | None = Field(default=None, index=True)
+    cache_predictions: bool = Field(default=False)
 
 
 class InferenceServerORM(SQLModel, table=True):
@@ -34,6 +37,10 @@ class InferenceServerORM(SQLModel, table=True):
     linked_model_id: int = Field(foreign_key=f"{ClassificationModelORM.__tablename__}.id")
     current_port: int | None = Field(nullable=True)
     current_host: str | None = Field(nullable=True)
+    # unix socket the server also listens on, usable by clients on the same host
+    current_socket_path: str | None = Field(nullable=True)
+    # process of the server on the worker host, used to retire it
+    pid: int | None = Field(nullable=True)
     cost: float = Field()
     server_state: int = Field(sa_column=Integer, default=ServerState.DEAD)
 
@@ -59,3 +66,44 @@ class Prediction(SQLModel, table=True):
     user_id: int = Field(foreign_key=f"{User.__tablename__}.id")
     input_data: dict = Field(sa_column=Column(JSON))
     output_data: dict = Field(sa_column=Column(JSON))
+
+
+class BulkScoringJobORM(SQLModel, table=True):
+
+    class JobState(enum.Enum):
+        PENDING = 0
+        RUNNING = 1
+        DONE = 2
+        FAILED = 3
+
+    id: int = Field(primary_key=True)
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now()))
+    updated_at: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now(), onupdate=func.now()))
+    model_id: int = Field(foreign_key=f"{ClassificationModelORM.__tablename__}.id")
+    input_path: str = Field(sa_column=Column(String))
+    output_path: str = Field(sa_column=Column(String))
+    chunk_rows: int = Field()
+    total_chunks: int | None = Field(nullable=True)
+    done_chunks: int = Field(default=0)
+    state: int = Field(default=JobState.PENDING.value)
+
+
+class AutoscalingPolicyORM(SQLModel, table=True):
+    id: int = Field(primary_key=True)
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now()))
+    updated_at: datetime = Field(sa_column=Column(DateTime(timezone=True), default=func.now(), onupdate=func.now()))
+    model_id: int = Field(foreign_key=f"{ClassificationModelORM.__tablename__}.id", unique=True)
+    min_replicas: int = Field(default=1)
+    max_replicas: int = Field(default=1)
+    # cost of the replicas the autoscaler starts
+    cost: float = Field()
+    target_in_flight: float = Field(default=4.0)
+    target_rps: float | None = Field(nullable=True)
+    target_latency_ms: float | None = Field(nullable=True)
+    scale_up_cooldown: float = Field(default=60.0)
+    scale_down_cooldown: float = Field(default=300.0)
+    idle_seconds: float = Field(default=300.0)
+    # unix times and the request total of the previous autoscaler pass
+    last_scaled_at: float | None = Field(nullable=True)
+    last_sampled_at: float | None = Field(nullable=True)
+    last_request_count: int = Field(default=0)
@@ -0,0 +1,81 @@
+from contextlib import AbstractAsyncContextManager
+from typing import Callable
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from src.core.config import configs
+from src.core.exceptions import DuplicatedError, NotFoundError
+from src.util.query_builder import dict_to_sqlalchemy_filter_options
+
+
+class AsyncBaseRepository:
+    """BaseRepository on an AsyncDatabase, for handlers that should not hold a thread per query."""
+
+    def __init__(self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]], model) -> None:
+        self.session_factory = session_factory
+        self.model = model
+
+    def _select(self, eager=False):
+        query = select(self.model)
+        if eager:
+            for eager in getattr(self.model, "eagers", []):
+                query = query.options(joinedload(getattr(self.model, eager)))
+        return query
+
+    async def read_by_options(self, schema, eager=False):
+        async with self.session_factory() as session:
+            schema_as_dict = schema.dict(exclude_none=True)
+            ordering = schema_as_dict.get("ordering", configs.ORDERING)
+            order_query = (
+                getattr(self.model, ordering[1:]).desc()
+                if ordering.startswith("-")
+                else getattr(self.model, ordering).asc()
+            )
+            page = schema_as_dict.get("page", configs.PAGE)
+            page_size = schema_as_dict.get("page_size", configs.PAGE_SIZE)
+            filter_options = dict_to_sqlalchemy_filter_options(self.model, schema.dict(exclude_none=True))
+            query = self._select(eager).where(filter_options).order_by(order_query)
+            if page_size != "all":
+                query = query.limit(page_size).offset((page - 1) * page_size)
+            founds = (await session.execute(query)).unique().scalars().all()
+            total_count = await session.scalar(
+                select(func.count()).select_from(self.model).where(filter_options)
+            )
+            return {
+                "founds": founds,
+                "search_options": {
+                    "page": page,
+                    "page_size": page_size,
+                    "ordering": ordering,
+                    "total_count": total_count,
+                },
+            }
+
+    async def read_by_id(self, id: int, eager=False):
+        async with self.session_factory() as session:
+            query = (await session.execute(self._select(eager).where(self.model.id == id))).unique().scalar()
+            if not query:
+                raise NotFoundError(detail=f"not found id : {id}")
+            return query
+
+    async def create(self, schema):
+        if not isinstance(schema, dict):
+            schema = schema.dict(exclude_none=True)
+        async with self.session_factory() as session:
+            query = self.model(**schema)
+            try:
+                session.add(query)
+                await session.commit()
+                await session.refresh(query)
+            except IntegrityError as e:
+                raise DuplicatedError(detail=str(e))
+            return query
+
+    async def update_attr(self, id: int, column: str, value):
+        async with self.session_factory() as session:
+            await session.execute(update(self.model).where(self.model.id == id).values({column: value}))
+            await session.commit()
+        return await self.read_by_id(id)
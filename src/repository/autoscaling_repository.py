@@ -0,0 +1,22 @@
+from contextlib import AbstractContextManager
+from typing import Callable
+
+from sqlmodel import Session
+
+from src.model.models import AutoscalingPolicyORM
+from src.repository.base_repository import BaseRepository
+
+
+class AutoscalingPolicyRepository(BaseRepository):
+
+    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]]):
+        self.session_factory = session_factory
+        super().__init__(session_factory, AutoscalingPolicyORM)
+
+    def get_by_model_id(self, model_id: int) -> AutoscalingPolicyORM | None:
+        with self.session_factory() as session:
+            return session.query(self.model).filter(self.model.model_id == model_id).first()
+
+    def get_all(self) -> list[AutoscalingPolicyORM]:
+        with self.session_factory() as session:
+            return session.query(self.model).all()
@@ -1,6 +1,7 @@
 from contextlib import AbstractContextManager
 from typing import Callable
 
+from sqlalchemy import insert, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 
@@ -71,14 +72,29 @@ class BaseRepository:
                 raise DuplicatedError(detail=str(e))
             return query
 
+    def create_many(self, schemas: list):
+        rows = [schema if isinstance(schema, dict) else schema.dict(exclude_none=True) for schema in schemas]
+        with self.session_factory() as session:
+            try:
+                session.execute(insert(self.model), rows)
+                session.commit()
+            except IntegrityError as e:
+                raise DuplicatedError(detail=str(e))
+
     def update(self, id: int, schema):
         if not isinstance(schema, dict):
             schema = schema.dict(exclude_none=True)
         with self.session_factory() as session:
-            session.query(self.model).filter(self.model.id == id).update(schema.dict(exclude_none=True))
+            session.query(self.model).filter(self.model.id == id).update(schema)
             session.commit()
             return self.read_by_id(id)
 
+    def update_many(self, rows: list[dict]):
+        # rows carry their primary key, SQLAlchemy runs them as one executemany per set of columns
+        with self.session_factory() as session:
+            session.execute(update(self.model), rows)
+            session.commit()
+
     def update_attr(self, id: int, column: str, value):
         with self.session_factory() as session:
             session.query(self.model).filter(self.model.id == id).update({column: value})
@@ -0,0 +1,37 @@
+from contextlib import AbstractContextManager
+from typing import Callable
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from src.model.models import BulkScoringJobORM
+from src.repository.base_repository import BaseRepository
+
+
+class BulkScoringJobRepository(BaseRepository):
+
+    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]]):
+        self.session_factory = session_factory
+        super().__init__(session_factory, BulkScoringJobORM)
+
+    def raise_done_chunks(self, job_id: int, done_chunks: int):
+        # writers count the parts concurrently, a late and lower count must not win
+        with self.session_factory() as session:
+            session.execute(
+                update(self.model)
+                .where(self.model.id == job_id, self.model.done_chunks < done_chunks)
+                .values(done_chunks=done_chunks)
+            )
+            session.commit()
+
+    def transition_state(self, job_id: int, from_states: list[int], to_state: int) -> bool:
+        """Moves the job to `to_state` only if it is in one of `from_states`, in one statement."""
+        with self.session_factory() as session:
+            moved = session.execute(
+                update(self.model)
+                .where(self.model.id == job_id, self.model.state.in_(from_states))
+                .values(state=to_state)
+                .returning(self.model.id)
+            ).scalar_one_or_none()
+            session.commit()
+            return moved is not None
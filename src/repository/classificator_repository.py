@@ -1,9 +1,11 @@
-from contextlib import AbstractContextManager
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
 from typing import Callable
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session
 
 from src.model.models import ClassificationModelORM
+from src.repository.async_base_repository import AsyncBaseRepository
 from src.repository.base_repository import BaseRepository
 
 
@@ -12,3 +14,10 @@ class ClassificatorRepository(BaseRepository):
     def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]]):
         self.session_factory = session_factory
         super().__init__(session_factory, ClassificationModelORM)
+
+
+class AsyncClassificatorRepository(AsyncBaseRepository):
+
+    def __init__(self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]]):
+        self.session_factory = session_factory
+        super().__init__(session_factory, ClassificationModelORM)
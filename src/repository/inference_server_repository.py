@@ -1,4 +1,5 @@
 from contextlib import AbstractContextManager
+from datetime import datetime
 from typing import Callable
 
 from sqlalchemy.orm import Session
@@ -20,3 +21,38 @@ class InferenceServerRepository(BaseRepository):
                 self.model.server_state == int(self.model.ServerState.ALIVE.value)
             )
             return query.first()
+
+    def get_all_by_linked_model_id(self, model_id) -> list[InferenceServerORM]:
+        with self.session_factory() as session:
+            query = session.query(self.model).filter(
+                self.model.linked_model_id == model_id,
+                self.model.server_state == int(self.model.ServerState.ALIVE.value)
+            )
+            return query.all()
+
+    def get_active_by_linked_model_id(self, model_id) -> list[InferenceServerORM]:
+        with self.session_factory() as session:
+            query = session.query(self.model).filter(
+                self.model.linked_model_id == model_id,
+                self.model.server_state.in_([
+                    int(self.model.ServerState.ALIVE.value),
+                    int(self.model.ServerState.STARTING.value)
+                ])
+            )
+            return query.all()
+
+    def get_starting_updated_before(self, cutoff: datetime) -> list[InferenceServerORM]:
+        with self.session_factory() as session:
+            query = session.query(self.model).filter(
+                self.model.server_state == int(self.model.ServerState.STARTING.value),
+                self.model.updated_at < cutoff
+            )
+            return query.all()
+
+    def get_leased_ports(self) -> set[int]:
+        with self.session_factory() as session:
+            query = session.query(self.model.current_port).filter(
+                self.model.current_port.is_not(None),
+                self.model.server_state != int(self.model.ServerState.DEAD.value)
+            )
+            return {port for port, in query.all()}
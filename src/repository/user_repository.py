@@ -1,9 +1,12 @@
-from contextlib import AbstractContextManager
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
 from typing import Callable
 
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session
 
 from src.model.models import User
+from src.repository.async_base_repository import AsyncBaseRepository
 from src.repository.base_repository import BaseRepository
 
 
@@ -11,3 +14,32 @@ class UserRepository(BaseRepository):
     def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]]):
         self.session_factory = session_factory
         super().__init__(session_factory, User)
+
+
+class AsyncUserRepository(AsyncBaseRepository):
+    def __init__(self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]]):
+        self.session_factory = session_factory
+        super().__init__(session_factory, User)
+
+    async def debit_balance(self, user_id: int, amount: float) -> float | None:
+        """Atomically takes `amount` off the balance; returns None when it is not enough."""
+        async with self.session_factory() as session:
+            balance = (await session.execute(
+                update(self.model)
+                .where(self.model.id == user_id, self.model.balance >= amount)
+                .values(balance=self.model.balance - amount)
+                .returning(self.model.balance)
+            )).scalar_one_or_none()
+            await session.commit()
+            return balance
+
+    async def credit_balance(self, user_id: int, amount: float) -> float | None:
+        async with self.session_factory() as session:
+            balance = (await session.execute(
+                update(self.model)
+                .where(self.model.id == user_id)
+                .values(balance=self.model.balance + amount)
+                .returning(self.model.balance)
+            )).scalar_one_or_none()
+            await session.commit()
+            return balance
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, Field, model_validator
+
+
+class AutoscalingPolicyInputSchema(BaseModel):
+    min_replicas: int = Field(default=1, ge=0)
+    max_replicas: int = Field(default=1, ge=0)
+    cost: float
+    target_in_flight: float = Field(default=4.0, gt=0)
+    target_rps: float | None = Field(default=None, gt=0)
+    target_latency_ms: float | None = Field(default=None, gt=0)
+    scale_up_cooldown: float = Field(default=60.0, ge=0)
+    scale_down_cooldown: float = Field(default=300.0, ge=0)
+    idle_seconds: float = Field(default=300.0, ge=0)
+
+    @model_validator(mode='after')
+    def check_bounds(self):
+        if self.min_replicas > self.max_replicas:
+            raise ValueError('min_replicas must not exceed max_replicas')
+        return self
+
+
+class AutoscalingPolicySchema(AutoscalingPolicyInputSchema):
+    id: int
+    model_id: int
+    last_scaled_at: float | None
+
+
+class ReplicaMetricsSchema(BaseModel):
+    id: int
+    in_flight: int
+    latency_ms: float
+    requests: int
+    idle_seconds: float | None
+
+
+class ModelMetricsSchema(BaseModel):
+    model_id: int
+    requests: int
+    in_flight: int
+    latency_ms: float
+    queued: int = 0
+    shed: int = 0
+    replicas: list[ReplicaMetricsSchema]
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+
+
+class BulkScoringRequestSchema(BaseModel):
+    input_path: str
+    output_path: str
+    chunk_rows: int = Field(default=1000, gt=0)
+
+
+class BulkScoringJobInputSchema(BulkScoringRequestSchema):
+    model_id: int
+    state: int
+
+
+class BulkScoringJobSchema(BaseModel):
+    id: int
+    model_id: int
+    input_path: str
+    output_path: str
+    chunk_rows: int
+    total_chunks: int | None
+    done_chunks: int
+    state: int
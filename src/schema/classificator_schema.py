@@ -5,3 +5,5 @@ class BaseClassificatorSchema(BaseModel):
     name: str
     cost: float
     model_file: str
+    content_hash: str | None = None
+    cache_predictions: bool = False
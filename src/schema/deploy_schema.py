@@ -10,4 +10,6 @@ class DeployResponseSchema(BaseModel):
 class DeployResultSchema(BaseModel):
     current_port: int | None
     current_host: str | None
+    current_socket_path: str | None = None
+    pid: int | None = None
     server_state: int
@@ -19,6 +19,48 @@ class InferenceServerActiveSchema(BaseModel):
     page_size: str | int = Field(default='all')
 
 
+class ModelCacheSettingSchema(BaseModel):
+    id: int
+    cache_predictions: bool
+
+
+class PredictionCacheStatsSchema(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+    max_bytes: int
+
+
+class ExecutorStatsSchema(BaseModel):
+    name: str
+    workers: int
+    pending: int
+    completed: int
+    rejected: int
+    queue_wait_p50_ms: float
+    queue_wait_p95_ms: float
+    queue_wait_max_ms: float
+
+
+class WaitBucketSchema(BaseModel):
+    le_ms: float | None
+    count: int
+
+
+class PoolStatsSchema(BaseModel):
+    name: str
+    size: int
+    in_use: int
+    idle: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    checkout_wait_sum_ms: float
+    checkout_wait_buckets: list[WaitBucketSchema]
+
+
 class ClassificationModelListQuerySchema(FindBase):
     ...
 
@@ -29,6 +29,10 @@ class InputPredictionSchema(BaseModel):
         orm_mode = True
 
 
+class InputTensorSchema(BaseModel):
+    input_tensor: list[list[float]]
+
+
 class PredictionServerSchema(BaseModel):
     prediction: list[float]
 
@@ -0,0 +1,29 @@
+from src.model.models import AutoscalingPolicyORM
+from src.repository.autoscaling_repository import AutoscalingPolicyRepository
+from src.schema.autoscaling_schema import AutoscalingPolicyInputSchema
+from src.services.base_service import BaseService
+
+
+class AutoscalingService(BaseService):
+
+    def __init__(self, autoscaling_repository: AutoscalingPolicyRepository):
+        self.autoscaling_repository = autoscaling_repository
+        super().__init__(autoscaling_repository)
+
+    def get_policy(self, model_id: int) -> AutoscalingPolicyORM | None:
+        return self.autoscaling_repository.get_by_model_id(model_id)
+
+    def get_policies(self) -> list[AutoscalingPolicyORM]:
+        return self.autoscaling_repository.get_all()
+
+    def set_policy(self, model_id: int, schema: AutoscalingPolicyInputSchema) -> AutoscalingPolicyORM:
+        policy = self.get_policy(model_id)
+        if policy is None:
+            return self.add({**schema.model_dump(), 'model_id': model_id})
+        return self.patch(policy.id, schema.model_dump())
+
+    def record_pass(self, policy: AutoscalingPolicyORM, request_count: int, sampled_at: float, scaled: bool):
+        values = {'last_request_count': request_count, 'last_sampled_at': sampled_at}
+        if scaled:
+            values['last_scaled_at'] = sampled_at
+        return self.patch(policy.id, values)
@@ -17,8 +17,28 @@ class BaseService:
     def patch_attr(self, id: int, attr: str, value):
         return self._repository.update_attr(id, attr, value)
 
+    def patch_many(self, rows: list[dict]):
+        return self._repository.update_many(rows)
+
     def put_update(self, id: int, schema):
         return self._repository.whole_update(id, schema)
 
     def remove_by_id(self, id):
         return self._repository.delete_by_id(id)
+
+
+class AsyncBaseService:
+    def __init__(self, repository) -> None:
+        self._repository = repository
+
+    async def get_list(self, schema):
+        return await self._repository.read_by_options(schema)
+
+    async def get_by_id(self, id: int):
+        return await self._repository.read_by_id(id)
+
+    async def add(self, schema):
+        return await self._repository.create(schema)
+
+    async def patch_attr(self, id: int, attr: str, value):
+        return await self._repository.update_attr(id, attr, value)
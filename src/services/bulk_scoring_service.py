@@ -0,0 +1,36 @@
+from src.core.exceptions import ConflictError
+from src.model.models import BulkScoringJobORM
+from src.repository.bulk_scoring_repository import BulkScoringJobRepository
+from src.services.base_service import BaseService
+
+
+class BulkScoringService(BaseService):
+    # a DONE job would be scored and billed again, a PENDING or RUNNING one is already being scored
+    RESUMABLE_STATES = (BulkScoringJobORM.JobState.FAILED,)
+
+    def __init__(self, bulk_scoring_repository: BulkScoringJobRepository):
+        self.bulk_scoring_repository = bulk_scoring_repository
+        super().__init__(bulk_scoring_repository)
+
+    def start(self, job_id: int, total_chunks: int, done_chunks: int) -> BulkScoringJobORM:
+        return self.patch(job_id, {
+            'total_chunks': total_chunks,
+            'done_chunks': done_chunks,
+            'state': BulkScoringJobORM.JobState.RUNNING.value,
+        })
+
+    def record_progress(self, job_id: int, done_chunks: int):
+        self.bulk_scoring_repository.raise_done_chunks(job_id, done_chunks)
+
+    def set_state(self, job_id: int, state: BulkScoringJobORM.JobState) -> BulkScoringJobORM:
+        return self.patch_attr(job_id, 'state', state.value)
+
+    def resume(self, job_id: int) -> BulkScoringJobORM:
+        resumable = [state.value for state in self.RESUMABLE_STATES]
+        if not self.bulk_scoring_repository.transition_state(
+                job_id, resumable, BulkScoringJobORM.JobState.PENDING.value
+        ):
+            job = self.get_by_id(job_id)
+            state = BulkScoringJobORM.JobState(job.state).name
+            raise ConflictError(detail=f'Bulk scoring job {job_id} is {state}, only failed jobs can be resumed')
+        return self.get_by_id(job_id)
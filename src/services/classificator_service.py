@@ -1,8 +1,14 @@
-from src.repository.classificator_repository import ClassificatorRepository
-from src.services.base_service import BaseService
+from src.repository.classificator_repository import AsyncClassificatorRepository, ClassificatorRepository
+from src.services.base_service import AsyncBaseService, BaseService
 
 
 class ClassificatorService(BaseService):
     def __init__(self, classificator_repository: ClassificatorRepository):
         self.classificator_repository = classificator_repository
         super().__init__(classificator_repository)
+
+
+class AsyncClassificatorService(AsyncBaseService):
+    def __init__(self, classificator_repository: AsyncClassificatorRepository):
+        self.classificator_repository = classificator_repository
+        super().__init__(classificator_repository)
@@ -1,21 +1,42 @@
-import dataclasses
-import subprocess
-import threading
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable
 
 import httpx
+import numpy as np
 from fastapi import HTTPException
 
-from src.core.classification_models.InferenceClient import SyncInferenceClient
-from src.core.classification_models.InferenceServer import InferenceServer
+from src.core.classification_models.AdmissionController import AdmissionController, Overloaded
+from src.core.classification_models.InferenceClient import AsyncInferenceClient
+from src.core.classification_models.InferenceServer import InferenceServer, to_joblib_artifact
+from src.core.classification_models.PortAllocator import PortAllocator
+from src.core.classification_models.PredictionCache import PredictionCache
+from src.core.classification_models.ReplicaRouter import ReplicaRouter
+from src.core.classification_models.RoutingCache import RoutingCache
+from src.core.classification_models.StartupSupervisor import StartupSupervisor
+from src.core.classification_models.WarmPool import WarmPool
+from src.core.config import configs
+from src.core.exceptions import ServiceUnavailableError
+from src.core.executors import BoundedExecutor
+from src.core.invalidation import publish_invalidation
 from src.model.models import ClassificationModelORM, InferenceServerORM
 
 from src.repository.inference_server_repository import InferenceServerRepository
+from src.repository.user_repository import AsyncUserRepository
 from src.schema.deploy_schema import DeployResultSchema
 from src.schema.inference_schema import InferenceServerInputSchema
 from src.schema.user_schema import User
 from src.services.base_service import BaseService
 
 
+logger = logging.getLogger(__name__)
+
+# keeps fire-and-forget tasks referenced until they finish
+_background_tasks: set[asyncio.Task] = set()
+
+
 class InferenceException(HTTPException):
     ...
 
@@ -24,79 +45,308 @@ class ServerStartError(Exception):
     ...
 
 
-@dataclasses.dataclass
-class ProcessWrapper:
-    process: subprocess.Popen
-    is_alive: bool = dataclasses.field(default=False)
+class InferenceService(BaseService):
 
+    def __init__(
+            self,
+            inference_repository: InferenceServerRepository,
+            async_user_repository: AsyncUserRepository,
+            replica_router: ReplicaRouter,
+            routing_cache: RoutingCache,
+            prediction_cache: PredictionCache,
+            warm_pool: WarmPool,
+            startup_supervisor: StartupSupervisor,
+            port_allocator: PortAllocator,
+            admission_controller: AdmissionController,
+            db_executor: BoundedExecutor
+    ):
+        self.inference_repository = inference_repository
+        self.async_user_repository = async_user_repository
+        self.replica_router = replica_router
+        self.routing_cache = routing_cache
+        self.prediction_cache = prediction_cache
+        self.warm_pool = warm_pool
+        self.startup_supervisor = startup_supervisor
+        self.port_allocator = port_allocator
+        self.admission_controller = admission_controller
+        self.db_executor = db_executor
+        super().__init__(inference_repository)
 
-def process_correct_monitor(process_wrapper: ProcessWrapper):
-    while True:
-        output = process_wrapper.process.stdout.readline()
-        if output.startswith(b'Application startup complete'):
-            process_wrapper.is_alive = True
-            break
+    def cold_start(self, model: ClassificationModelORM, server_id: int,
+                   on_result: Callable[[DeployResultSchema], None]):
+        """
+        Starts server `server_id` for `model` and returns once the process is
+        spawned. The leased port is recorded on the server right away, the pid
+        as soon as the process runs.
+        `on_result` gets the deploy result when the startup supervisor sees the
+        server answer its health check, or gives up on it.
+        """
+        process = None
+        try:
+            model_file = model.model_file
+            if configs.INFERENCE_MMAP_MODELS:
+                model_file = to_joblib_artifact(model_file, configs.INFERENCE_MMAP_CONVERT_TIMEOUT)
+            server_pilot = InferenceServer.from_generated(
+                model_file,
+                self.port_allocator,
+                self.inference_repository.get_leased_ports(),
+                socket_dir=configs.INFERENCE_SOCKET_DIR,
+                batch_max_size=configs.INFERENCE_BATCH_MAX_SIZE,
+                batch_max_wait_us=configs.INFERENCE_BATCH_MAX_WAIT_US,
+                workers=configs.INFERENCE_SERVER_WORKERS,
+            )
+            self.put_update(server_id, DeployResultSchema(
+                current_port=server_pilot.port,
+                current_host=server_pilot.host,
+                current_socket_path=server_pilot.socket_path,
+                server_state=InferenceServerORM.ServerState.STARTING
+            ))
+            process = server_pilot.run_inference_server(dict(LINKED_MODEL_ID=str(model.id)), self.warm_pool)
+            # recorded while still STARTING, so a start that is expired later can be killed by its pid
+            self.patch_attr(server_id, 'pid', process.pid)
 
+            def report(ready: bool):
+                on_result(DeployResultSchema(
+                    current_port=server_pilot.port,
+                    current_host=server_pilot.host,
+                    current_socket_path=server_pilot.socket_path,
+                    pid=process.pid,
+                    server_state=InferenceServerORM.ServerState.ALIVE if ready else InferenceServerORM.ServerState.DEAD
+                ))
 
-class InferenceService(BaseService):
+            self.startup_supervisor.watch(process, 'localhost', server_pilot.port, model.id, report)
+        except Exception:
+            # without a report the row would stay STARTING and keep counting as a replica
+            if process is not None and process.poll() is None:
+                process.terminate()
+            on_result(DeployResultSchema(
+                current_port=None,
+                current_host=None,
+                server_state=InferenceServerORM.ServerState.DEAD
+            ))
+            raise
 
-    def __init__(self, inference_repository: InferenceServerRepository):
-        self.inference_repository = inference_repository
-        super().__init__(inference_repository)
+    def get_stale_starting(self, timeout: float) -> list[InferenceServerORM]:
+        """Servers STARTING for more than `timeout` seconds, their cold start was lost or never reported."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=timeout)
+        return self.inference_repository.get_starting_updated_before(cutoff)
 
     @staticmethod
-    def cold_start(model: ClassificationModelORM):
-        server_pilot = InferenceServer.from_generated(model.model_file)
-        server_process = ProcessWrapper(
-            process=server_pilot.run_inference_server(dict(LINKED_MODEL_ID=str(model.id)))
-        )
-        stderr_thread = threading.Thread(target=process_correct_monitor, args=[server_process])
-        stderr_thread.start()
-        stderr_thread.join(60)
-        if server_process.process.poll():
-            server_state = InferenceServerORM.ServerState.DEAD
-        else:
-            server_state = InferenceServerORM.ServerState.ALIVE
-
-        return DeployResultSchema(
-            current_port=server_pilot.port,
-            current_host=server_pilot.host,
-            server_state=server_state
-        )
+    async def probe(client: httpx.AsyncClient, inference_server: InferenceServerORM) -> int | None:
+        """Returns the model id a server reports, or None when it does not answer in time."""
+        url = AsyncInferenceClient.base_url(inference_server.current_host, inference_server.current_port)
+        try:
+            response = await client.get(url + '/api/v2/healthcheck')
+            response.raise_for_status()
+            return response.json()['linked_model_id']
+        except (httpx.HTTPError, KeyError, ValueError):
+            return None
+
+    async def health_sweep(self, inference_servers: list[InferenceServerORM]) -> list[dict]:
+        """
+        Probes the servers concurrently and returns only the changes, as rows
+        for `patch_many`. A server that misses HEALTH_CHECK_ATTEMPTS probes in a
+        row goes DEAD, so one slow answer does not take it out. A server that
+        reports a different model id gets that id.
+        """
+        semaphore = asyncio.Semaphore(configs.HEALTH_CHECK_CONCURRENCY)
+        limits = httpx.Limits(max_connections=configs.HEALTH_CHECK_CONCURRENCY, max_keepalive_connections=0)
+
+        async with httpx.AsyncClient(timeout=configs.HEALTH_CHECK_TIMEOUT, limits=limits) as client:
+            async def check(server: InferenceServerORM) -> dict | None:
+                for attempt in range(max(configs.HEALTH_CHECK_ATTEMPTS, 1)):
+                    if attempt:
+                        await asyncio.sleep(configs.HEALTH_CHECK_RETRY_DELAY)
+                    async with semaphore:
+                        linked_id = await self.probe(client, server)
+                    if linked_id is not None:
+                        break
+                if linked_id is None:
+                    return {'id': server.id, 'server_state': InferenceServerORM.ServerState.DEAD.value}
+                if linked_id != server.linked_model_id:
+                    return {'id': server.id, 'linked_model_id': linked_id}
+                return None
+
+            changes = await asyncio.gather(*map(check, inference_servers))
+        return [change for change in changes if change is not None]
 
     @staticmethod
-    def do_health_check(inference_server: InferenceServerORM):
-        client = SyncInferenceClient(
-            inference_server.current_host,
-            inference_server.current_port
-        )
+    def client_for(inference_server: InferenceServerORM) -> AsyncInferenceClient:
+        socket_path = inference_server.current_socket_path
+        # the socket only exists when the server runs on this host
+        uds = socket_path if socket_path and os.path.exists(socket_path) else None
+        return AsyncInferenceClient.pooled('localhost', inference_server.current_port, uds)
+
+    def get_active_replicas(self, model_id: int) -> list[InferenceServerORM]:
+        return self.inference_repository.get_active_by_linked_model_id(model_id)
+
+    def mark_dead(self, inference_server: InferenceServerORM):
+        """
+        Takes a server that refused a connection out of rotation at once.
+        The DEAD state is written and announced in the background, once per
+        server, however many requests saw it fail.
+        """
+        if not self.replica_router.discard(inference_server):
+            return
+        self.routing_cache.discard_server(inference_server)
+        task = asyncio.create_task(self._record_dead(inference_server))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def _record_dead(self, inference_server: InferenceServerORM):
         try:
-            response = client.health_check()
-            response.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            raise InferenceException(detail=str(e), status_code=504)
-        except Exception as e:
-            raise InferenceException(detail=str(e), status_code=502)
-        return response.json()['linked_model_id']
+            await AsyncInferenceClient.close_pool('localhost', inference_server.current_port)
+            await self.db_executor.run(
+                self.patch_attr, inference_server.id, 'server_state', InferenceServerORM.ServerState.DEAD.value
+            )
+            await asyncio.to_thread(
+                publish_invalidation, configs.CELERY_BROKER, RoutingCache.TOPIC, inference_server.linked_model_id
+            )
+        except Exception:
+            logger.exception('Could not record server %s as DEAD', inference_server.id)
+
+    async def _load_alive_servers(self, model_id: int) -> list[InferenceServerORM]:
+        return await self.db_executor.run(self.inference_repository.get_all_by_linked_model_id, model_id)
+
+    async def refresh_replicas(self, model_id: int):
+        servers = await self.routing_cache.servers(model_id, self._load_alive_servers)
+        for server in self.replica_router.update(model_id, servers):
+            await AsyncInferenceClient.close_pool('localhost', server.current_port)
+
+    async def charge(self, user: User, cost: float):
+        balance = await self.async_user_repository.debit_balance(user.id, cost)
+        if balance is None:
+            raise InferenceException(detail='Not enough money!', status_code=429)
+        user.balance = balance
+
+    async def refund(self, user: User, cost: float):
+        balance = await self.async_user_repository.credit_balance(user.id, cost)
+        if balance is not None:
+            user.balance = balance
+
+    async def infer(self, user: User, model: ClassificationModelORM, input_tensor: np.ndarray):
+        cache_key = None
+        if model.cache_predictions:
+            cache_key = self.prediction_cache.key(model.id, input_tensor)
+            cached = self.prediction_cache.get(cache_key)
+            if cached is not None:
+                server_id, cost, inference_data = cached
+                await self.charge(user, cost)
+                return server_id, inference_data
+
+        await self.refresh_replicas(model.id)
+        replicas = self.replica_router.replicas(model.id)
+        if not replicas:
+            self.replica_router.count_unroutable(model.id)
+            raise InferenceException(detail='No inference servers available!', status_code=404)
+        try:
+            async with self.admission_controller.admit(model.id, len(replicas)):
+                inference_server, response = await self._predict(user, model, input_tensor)
+        except Overloaded:
+            raise ServiceUnavailableError(
+                detail=f'Model {model.id} is overloaded, retry later',
+                headers={'Retry-After': str(configs.INFERENCE_RETRY_AFTER)}
+            )
+        inference_data = response.json()
+        if cache_key is not None and 'prediction' in inference_data:
+            self.prediction_cache.put(
+                cache_key, inference_server.id, inference_server.cost, inference_data, len(response.content)
+            )
+        return inference_server.id, inference_data
 
-    def infer(self, user: User, model: ClassificationModelORM, input_data: dict):
-        inference_server = self.inference_repository.get_by_linked_model_id(model_id=model.id)
+    async def _predict(self, user: User, model: ClassificationModelORM, input_tensor: np.ndarray):
+        """
+        Sends the tensor to the least loaded replica. A connect failure, a
+        dropped connection or a 5xx is retried on another ALIVE replica until
+        INFERENCE_MAX_ATTEMPTS replicas were tried or INFERENCE_REQUEST_DEADLINE
+        passes. With INFERENCE_HEDGE a duplicate goes to a second replica once
+        the request runs longer than the model's p95, and the first answer wins.
+        The request is charged once, at the price of the first replica, and
+        refunded unless a response comes back, also when the caller is cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + configs.INFERENCE_REQUEST_DEADLINE
+        inference_server = self.replica_router.choose(model.id, configs.INFERENCE_MAX_IN_FLIGHT_PER_REPLICA)
         if not inference_server:
             raise InferenceException(detail='No inference servers available!', status_code=404)
-        if not user.balance >= inference_server.cost:
-            raise InferenceException(detail='Not enough money!', status_code=429)
+        # reserve the cost up front so parallel requests cannot overspend, refund unless delivered
+        await self.charge(user, inference_server.cost)
+        delivered = False
+
+        hedge_after = self.replica_router.latency_quantile(model.id, 0.95) if configs.INFERENCE_HEDGE else None
+        attempts: dict[asyncio.Task, InferenceServerORM] = {}
+        tried: set[int] = set()
+        error: Exception | None = None
+
+        def attempt(server: InferenceServerORM):
+            tried.add(server.id)
+            attempts[asyncio.create_task(self._send(server, input_tensor))] = server
+            return loop.time()
 
-        client = SyncInferenceClient(
-            'localhost',
-            inference_server.current_port
-        )
+        def next_replica() -> InferenceServerORM | None:
+            if len(tried) >= configs.INFERENCE_MAX_ATTEMPTS:
+                return None
+            return self.replica_router.choose(model.id, configs.INFERENCE_MAX_IN_FLIGHT_PER_REPLICA, exclude=tried)
 
         try:
-            response = client.predict(input_data)
-            response.raise_for_status()
+            started = attempt(inference_server)
+            while attempts:
+                wake_at = deadline
+                if hedge_after is not None:
+                    wake_at = min(wake_at, started + hedge_after)
+                done, _ = await asyncio.wait(
+                    attempts, timeout=max(wake_at - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if loop.time() >= deadline:
+                        break
+                    # the only hedge of this request, it races the attempt still running
+                    hedge_after = None
+                    if (server := next_replica()) is not None:
+                        attempt(server)
+                    continue
+                for task in done:
+                    server = attempts.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        if not self._retryable(e):
+                            raise
+                        error = e
+                        continue
+                    delivered = True
+                    return server, response
+                if not attempts and (server := next_replica()) is not None:
+                    started = attempt(server)
         except httpx.HTTPStatusError as e:
             raise InferenceException(detail=str(e), status_code=504)
         except Exception as e:
             raise InferenceException(detail=str(e), status_code=502)
-        user.balance -= inference_server.cost
-        return inference_server.id, response.json()
+        finally:
+            for task in attempts:
+                task.cancel()
+            if not delivered:
+                # a cancelled caller (client gone, sibling chunk failed) skips the handlers above,
+                # the shield lets the refund finish even if it is cancelled again
+                await asyncio.shield(self.refund(user, inference_server.cost))
+        if error is None:
+            raise InferenceException(detail='Inference deadline exceeded', status_code=504)
+        status_code = 504 if isinstance(error, httpx.HTTPStatusError) else 502
+        raise InferenceException(detail=str(error), status_code=status_code)
+
+    async def _send(self, inference_server: InferenceServerORM, input_tensor: np.ndarray) -> httpx.Response:
+        client = self.client_for(inference_server)
+        try:
+            async with self.replica_router.track(inference_server):
+                response = await client.predict_tensor(input_tensor, configs.INFERENCE_WIRE_FORMAT)
+                response.raise_for_status()
+        except httpx.ConnectError:
+            self.mark_dead(inference_server)
+            raise
+        return response
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
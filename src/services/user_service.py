@@ -1,8 +1,39 @@
+from src.core.auth_cache import AuthCache
+from src.core.config import configs
+from src.core.invalidation import publish_invalidation
 from src.repository.user_repository import UserRepository
 from src.services.base_service import BaseService
 
 
 class UserService(BaseService):
-    def __init__(self, user_repository: UserRepository):
+    def __init__(self, user_repository: UserRepository, auth_cache: AuthCache):
         self.user_repository = user_repository
+        self.auth_cache = auth_cache
         super().__init__(user_repository)
+
+    # balance, active and superuser changes must reach the auth caches of every API process
+
+    def _invalidate(self, id: int):
+        # the local cache directly, without a broker the broadcast below is a no-op
+        self.auth_cache.invalidate(id)
+        publish_invalidation(configs.CELERY_BROKER, AuthCache.TOPIC, id)
+
+    def patch(self, id: int, schema):
+        user = super().patch(id, schema)
+        self._invalidate(id)
+        return user
+
+    def patch_attr(self, id: int, attr: str, value):
+        user = super().patch_attr(id, attr, value)
+        self._invalidate(id)
+        return user
+
+    def put_update(self, id: int, schema):
+        user = super().put_update(id, schema)
+        self._invalidate(id)
+        return user
+
+    def remove_by_id(self, id):
+        result = super().remove_by_id(id)
+        self._invalidate(id)
+        return result
@@ -0,0 +1,38 @@
+from src.core import autoscaler
+from src.core.classification_models.ReplicaRouter import ReplicaRouter
+from src.model.models import AutoscalingPolicyORM, InferenceServerORM
+
+
+def make_policy(**kwargs) -> AutoscalingPolicyORM:
+    return AutoscalingPolicyORM(model_id=1, cost=1.0, min_replicas=0, max_replicas=3, scale_up_cooldown=0, **kwargs)
+
+
+def test_model_scaled_to_zero_starts_a_replica_when_requests_are_turned_away():
+    router = ReplicaRouter(ewma_alpha=0.3)
+    policy = make_policy(last_sampled_at=100.0, last_request_count=0)
+    for _ in range(5):
+        router.count_unroutable(1)
+    [metrics] = router.metrics()
+    rate = autoscaler.request_rate(policy, metrics['requests'], 110.0)
+
+    decision = autoscaler.plan(policy, metrics, [], rate, 110.0)
+
+    assert decision.start == 1
+
+
+def test_idle_model_scaled_to_zero_stays_at_zero():
+    policy = make_policy(last_sampled_at=100.0, last_request_count=5)
+    metrics = {'requests': 5, 'in_flight': 0, 'latency_ms': 0.0, 'replicas': []}
+    rate = autoscaler.request_rate(policy, metrics['requests'], 110.0)
+
+    assert autoscaler.plan(policy, metrics, [], rate, 110.0).start == 0
+
+
+def test_starting_replica_is_not_started_twice():
+    policy = make_policy(last_sampled_at=100.0, last_request_count=0)
+    metrics = {'requests': 5, 'in_flight': 0, 'latency_ms': 0.0, 'replicas': []}
+    starting = InferenceServerORM(id=7, linked_model_id=1, cost=1.0,
+                                  server_state=InferenceServerORM.ServerState.STARTING.value)
+    rate = autoscaler.request_rate(policy, metrics['requests'], 110.0)
+
+    assert autoscaler.plan(policy, metrics, [starting], rate, 110.0).start == 0